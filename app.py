@@ -13,19 +13,38 @@ sheetName = 'dropboxUpload_APP'
 # PARAMETERS FOR DATA PREPARATION AND ARCHIVING
 fileSizeLimit_GB = 500
 chunkSizeSplit_MB = 1024
+splitMode = 'sequential' # 'parallel' WRITES THE PARTS OF A LARGE FILE AT THE SAME TIME, FASTER ON STRIPED STORAGE. 'inPlace' NEEDS FREE SPACE FOR ONLY ONE PART
+numSplitWorkers = 4
+virtualSplit = False # API ONLY - LARGE FILES ARE UPLOADED AS _split_ PARTS STRAIGHT FROM THE ORIGINAL FILE WITHOUT SPLITTING ON DISK
+scanIndexFile = './logs/scanIndex.db'   # DIRECTORY SCANS ARE KEPT HERE SO THAT A RERUN ONLY RESCANS CHANGED DIRECTORIES
+skipUploaded = False # FILES ALREADY ON DROPBOX WITH THE SAME SIZE AND CONTENT HASH ARE NOT UPLOADED AGAIN
+deleteSkipped = False # DELETE THE SOURCE OF FILES THAT ARE ALREADY ON DROPBOX
+hashCacheFile = './logs/hashCache.db' # CONTENT HASHES OF LOCAL FILES ARE KEPT HERE SO THAT UNCHANGED FILES ARE NOT READ AGAIN
 
 # PARAMETERS FOR DATA UPLOAD USING APP
 dropboxDir = r'E:\Dropbox (NUSCentreofBioImagin)'   # DIRECTORY WHERE DROPBOX SYNC DIRECTORY IS LOCATED
 batchSize_GB = 1000
 sleepTime_min = 30
 batchTimeLimit_hour=24
+batchStrategy = 'sequential' # 'sequential', 'firstFitDecreasing' (FULLER BATCHES) OR 'directory' (A DIRECTORY IS NOT SPLIT ACROSS BATCHES)
+r_wSpeedCutOff = 0.5 # IN MB/s, DROPBOX IS IDLE WHEN ITS DISK AND UPLOAD SPEED STAYS BELOW THIS FOR idleWindow_s
+idleWindow_s = 120
+pollTime_s = 60 # FIRST WAIT BETWEEN TWO CHECKS OF A BATCH, DOUBLED UP TO sleepTime_min
+stagingBudget_GB = None # LOCAL DISK USED BY COPIED BATCHES, THE NEXT BATCH IS COPIED WHILE THE CURRENT ONE SYNCS IF BOTH FIT. None IS 2*batchSize_GB
+numCopyWorkers = 8 # NUMBER OF SMALL FILES COPIED TO THE DROPBOX DIRECTORY AT THE SAME TIME
+verifyHash = True # COMPARE THE CONTENT HASH OF EVERY FILE ON DROPBOX. False ONLY COMPARES THE SIZE BUT COPIES LARGE FILES FASTER
+moveMode = False # FILES ON THE SAME DRIVE AS dropboxDir ARE MOVED INTO IT WITHOUT COPYING
+moveJournalFile = './logs/upload/moveJournal.json' # MOVED FILES ARE RECORDED HERE UNTIL VERIFIED SO THAT A RERUN AFTER A CRASH MOVES THEM BACK
+rollback = True # MOVED FILES THAT ARE NOT VERIFIED ON DROPBOX ARE MOVED BACK
 accessToken = '##############################' # GET DROPBOX ACCESS TOKEN BY CREATING AN APP HERE - https://www.dropbox.com/developers/apps
 
 # PARAMETERS FOR DATA UPLOAD USING API
 chunkSize_MB = 128 # in MB
+numWorkers = 8 # NUMBER OF SMALL FILES UPLOADED AT THE SAME TIME, 1 UPLOADS ONE FILE AT A TIME
+journalFile = './logs/upload/uploadJournal.json' # UPLOAD SESSIONS ARE RECORDED HERE SO THAT A RERUN CONTINUES LARGE UPLOADS
 
-dp = dataPrep.dataPrep(excelName,sheetName,fileSizeLimit_GB,chunkSizeSplit_MB)
+dp = dataPrep.dataPrep(excelName,sheetName,fileSizeLimit_GB,chunkSizeSplit_MB,scanIndexFile,splitMode,numSplitWorkers,virtualSplit)
 if ('APP' in sheetName):
-    dbx = dropboxBatch.dropboxApp(excelName,sheetName,dropboxDir,accessToken,batchSize_GB,sleepTime_min,batchTimeLimit_hour)
+    dbx = dropboxBatch.dropboxApp(excelName,sheetName,dropboxDir,accessToken,batchSize_GB,sleepTime_min,batchTimeLimit_hour,scanIndexFile,dp.manifest,batchStrategy,r_wSpeedCutOff,idleWindow_s,pollTime_s,stagingBudget_GB,numCopyWorkers,verifyHash,moveMode,rollback,skipUploaded,deleteSkipped,hashCacheFile,moveJournalFile)
 elif ('API' in sheetName):
-    dbx = dropboxBatch.dropboxAPI(excelName,sheetName,accessToken,chunkSize_MB)
+    dbx = dropboxBatch.dropboxAPI(excelName,sheetName,accessToken,chunkSize_MB,scanIndexFile,dp.manifest,numWorkers,journalFile,skipUploaded,deleteSkipped,hashCacheFile)
@@ -1,7 +1,14 @@
 import pandas
 import os
+import sys
 from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath('./lib'))
+
 import utils
+import copyRange
+import contentHash
 
 ############################################################
 # READ THE INPUT EXCEL FILE AND COMBINE THE SPLIT FILES.
@@ -15,28 +22,114 @@ IS SPLIT INTO 3 PARTS:
     largeFile.zip_split_0002
     largeFile.zip_split_0003.
 THEN path_to_file\largeFile.zip_split_0001 WITH COMPLETE
-PATH SHOULD BE ENTERED IN THE EXCEL FILE.
+PATH SHOULD BE ENTERED IN THE EXCEL FILE. IF THE SIDECAR FILE
+largeFile.zip.split.json IS IN THE SAME DIRECTORY, THE SIZE
+AND CONTENT HASH OF EVERY SPLIT IS CHECKED.
 '''
 
-df = pandas.read_excel('inputs.xlsx',sheet_name='joinFiles',names=['inputFile','deleteFlag'])
+numWorkers = 4 # NUMBER OF SPLIT FILES COPIED AT THE SAME TIME, SHARED BY ALL THE FILES IN THE EXCEL SHEET
 
-chunkSizeMB = 1024 # in MB
-chunkSize = chunkSizeMB*1024*1024
+############################################################
+def getSplitList(inputFile):
+    """ Get the split files of a large file from its sidecar file, or
+    from the directory if there is no sidecar file.
+
+    Usage:
+    -----
+    fileName,fileSize,splitFileList,splitSizeList,hashList = getSplitList(inputFile)
+    """
 
-for inputFile,deleteFlag in df.values:
     fileName = inputFile.split('_split_0001')[0]
-    splitFileList = utils.findSplitFiles(inputFile)
-    print ('Combining split files for %s' %(fileName))
-    outFile = open(fileName,'wb')
-    for splitFile in tqdm(splitFileList):
-        inFile = open(splitFile,'rb')
-        while (1):
-            chunk = inFile.read(chunkSize)
-            if not chunk:
-                break
-            outFile.write(chunk)
-        inFile.close()
-        if (deleteFlag==1):
-            os.remove(splitFile)
-    outFile.close()
+    sidecarFile = fileName+'.split.json'
+    if (os.path.exists(sidecarFile)):
+        fileSize,splitFileList,splitSizeList,hashList = utils.readSplitSidecar(sidecarFile)
+    else:
+        splitFileList = utils.findSplitFiles(inputFile)
+        splitSizeList = [os.path.getsize(splitFile) for splitFile in splitFileList]
+        hashList = [None]*len(splitFileList)
+        fileSize = sum(splitSizeList)
+    return fileName,fileSize,splitFileList,splitSizeList,hashList
+############################################################
+
+############################################################
+def checkSplitSizes(fileSize,splitFileList,splitSizeList):
+    """ Check that every split file exists and has the expected size.
+
+    Usage:
+    -----
+    errorList = checkSplitSizes(fileSize,splitFileList,splitSizeList)
+    """
+
+    errorList = []
+    for splitFile,splitSize in zip(splitFileList,splitSizeList):
+        if not(os.path.exists(splitFile)):
+            errorList.append('%s is missing' %(splitFile))
+        elif (os.path.getsize(splitFile)!=splitSize):
+            errorList.append('%s is %d bytes, expected %d bytes' %(splitFile,os.path.getsize(splitFile),splitSize))
+    if (sum(splitSizeList)!=fileSize):
+        errorList.append('splits add up to %d bytes, expected %d bytes' %(sum(splitSizeList),fileSize))
+    return errorList
+############################################################
+
+############################################################
+def preallocate(fileName,fileSize):
+    """ Create fileName with fileSize bytes allocated on disk, so that
+    the splits can be written at their offsets in any order.
+    """
+
+    with open(fileName,'wb') as f:
+        try:
+            os.posix_fallocate(f.fileno(),0,fileSize)
+        except (AttributeError,OSError):
+            f.truncate(fileSize)
+############################################################
+
+############################################################
+def joinSplit(splitFile,fileName,offset,splitSize,splitHash,progress):
+    """ Copy one split file into fileName at offset, inside the kernel
+    where possible. If splitHash is given, the Dropbox content_hash of
+    the copied range of fileName is computed by reading it back and
+    compared with it. Returns False if the split could not be copied or
+    the content_hash is different.
+
+    Usage:
+    -----
+    ok = joinSplit(splitFile,fileName,offset,splitSize,splitHash,progress)
+    """
+
+    try:
+        with open(splitFile,'rb',buffering=0) as inFile, open(fileName,'r+b',buffering=0) as outFile:
+            copyRange.copyRange(inFile.fileno(),outFile.fileno(),0,offset,splitSize,progress=progress)
+        return (splitHash is None or contentHash.fileContentHash(fileName,length=splitSize,offset=offset).hexdigest()==splitHash)
+    except (IOError,OSError) as e:
+        print ('Error copying %s - %s' %(splitFile,e))
+        return False
+############################################################
+
+df = pandas.read_excel('inputs.xlsx',sheet_name='joinFiles',names=['inputFile','deleteFlag'])
+
+jobList = []
+for inputFile,deleteFlag in df.values:
+    fileName,fileSize,splitFileList,splitSizeList,hashList = getSplitList(inputFile)
+    errorList = checkSplitSizes(fileSize,splitFileList,splitSizeList)
+    if (len(errorList)>0):
+        print ('Not combining %s\n\t%s' %(fileName,'\n\t'.join(errorList)))
+        continue
+    print ('Combining %d split files for %s' %(len(splitFileList),fileName))
+    preallocate(fileName,fileSize)
+    jobList.append([fileName,deleteFlag,splitFileList,splitSizeList,hashList])
+
+with tqdm(total=sum(sum(job[3]) for job in jobList),unit='B',unit_scale=True) as progressBar:
+    with ThreadPoolExecutor(max_workers=numWorkers) as executor:
+        for job in jobList:
+            fileName,deleteFlag,splitFileList,splitSizeList,hashList = job
+            offsetList = [sum(splitSizeList[:i]) for i in range(len(splitSizeList))]
+            job.append([executor.submit(joinSplit,splitFile,fileName,offset,splitSize,splitHash,progressBar.update) for splitFile,offset,splitSize,splitHash in zip(splitFileList,offsetList,splitSizeList,hashList)])
+        for fileName,deleteFlag,splitFileList,splitSizeList,hashList,futureList in jobList:
+            badList = [splitFile for splitFile,future in zip(splitFileList,futureList) if not(future.result())]
+            if (len(badList)>0):
+                os.remove(fileName)
+                print ('Content hash mismatch, %s not combined\n\t%s' %(fileName,'\n\t'.join(badList)))
+            elif (deleteFlag==1):
+                utils.deleteFiles(splitFileList+[fileName+'.split.json'])
 ############################################################
@@ -0,0 +1,232 @@
+import os
+import numpy
+
+strategyList = ['sequential','firstFitDecreasing','directory']
+
+############################################################
+def sequentialBatches(fileSizeList,batchSize):
+    """ Split the files into batches in the order they are given. A
+    batch ends before the file that would take it over batchSize. The
+    end of every batch is found with a binary search on the cumulative
+    sum of the file sizes, so there is one step per batch and not one
+    per file. A file bigger than batchSize is put in a batch on its
+    own.
+
+    Parameters:
+    ----------
+    fileSizeList : array of int
+        size in bytes of every file.
+    batchSize : float
+        maximum size in bytes of a batch.
+
+    Returns:
+    -------
+    batchList : list of array of int
+        indices of the files in every batch.
+
+    Usage:
+    -----
+    batchList = sequentialBatches(fileSizeList,batchSize)
+    """
+
+    fileSizeList = numpy.asarray(fileSizeList,dtype='int64')
+    numFiles = len(fileSizeList)
+    cumSize = numpy.concatenate(([0],numpy.cumsum(fileSizeList)))
+    batchList,start = [],0
+    while (start<numFiles):
+        end = numpy.searchsorted(cumSize,cumSize[start]+batchSize,side='right')-1
+        end = max(end,start+1)
+        batchList.append(numpy.arange(start,end))
+        start = end
+    return batchList
+############################################################
+
+############################################################
+def firstFitDecreasingBatches(fileSizeList,batchSize):
+    """ Split the files into batches with the first-fit-decreasing bin
+    packing heuristic. The files are taken from the largest to the
+    smallest and every file goes into the first batch that still has
+    space for it. This uses fewer, fuller batches than
+    sequentialBatches() but files from the same directory can end up
+    in different batches. Within a batch the files keep their
+    original order.
+
+    The files are placed in runs rather than one at a time. Once the
+    first batch j with space for a file is found, the files after it
+    that are too large for every batch before j, and that still fit
+    in j, would all go to j, so the end of the run is found with a
+    binary search on the sorted sizes and on their cumulative sum.
+    The result is the same as placing the files one by one.
+
+    Parameters:
+    ----------
+    fileSizeList : array of int
+        size in bytes of every file.
+    batchSize : float
+        maximum size in bytes of a batch.
+
+    Returns:
+    -------
+    batchList : list of array of int
+        indices of the files in every batch.
+
+    Usage:
+    -----
+    batchList = firstFitDecreasingBatches(fileSizeList,batchSize)
+    """
+
+    fileSizeList = numpy.asarray(fileSizeList,dtype='int64')
+    numFiles = len(fileSizeList)
+    order = numpy.argsort(-fileSizeList,kind='stable')
+    negSize = -fileSizeList[order]
+    cumSize = numpy.concatenate(([0],numpy.cumsum(-negSize)))
+    batchIndex = numpy.zeros(numFiles,dtype='int64')
+    freeSpace = numpy.zeros(0,dtype='int64')
+    start = 0
+    while (start<numFiles):
+        fitFlag = freeSpace>=-negSize[start]
+        if (fitFlag.any()):
+            j = int(numpy.argmax(fitFlag))
+        else:
+            j = len(freeSpace)
+            freeSpace = numpy.append(freeSpace,numpy.int64(batchSize))
+        earlierFree = freeSpace[:j].max() if (j>0) else numpy.int64(-1)
+        end = min(numpy.searchsorted(negSize,-earlierFree,side='left'),numpy.searchsorted(cumSize,cumSize[start]+freeSpace[j],side='right')-1)
+        end = max(end,start+1)
+        freeSpace[j] -= cumSize[end]-cumSize[start]
+        batchIndex[order[start:end]] = j
+        start = end
+    return groupIndices(batchIndex,len(freeSpace))
+############################################################
+
+############################################################
+def directoryBatches(fileSizeList,dirNameList,batchSize):
+    """ Split the files into batches keeping the files of a directory
+    in the same batch. The directories are added to a batch in the
+    order they first appear until the next directory does not fit,
+    the same way as sequentialBatches() does for files. A directory
+    bigger than batchSize is split on its own with
+    sequentialBatches().
+
+    Parameters:
+    ----------
+    fileSizeList : array of int
+        size in bytes of every file.
+    dirNameList : array of str
+        directory of every file.
+    batchSize : float
+        maximum size in bytes of a batch.
+
+    Returns:
+    -------
+    batchList : list of array of int
+        indices of the files in every batch.
+
+    Usage:
+    -----
+    batchList = directoryBatches(fileSizeList,dirNameList,batchSize)
+    """
+
+    fileSizeList = numpy.asarray(fileSizeList,dtype='int64')
+    if (len(fileSizeList)==0):
+        return []
+    _,firstIndex,dirIndex = numpy.unique(numpy.asarray(dirNameList),return_index=True,return_inverse=True)
+    dirIndex = dirIndex.ravel()
+    dirOrder = numpy.argsort(numpy.argsort(firstIndex))
+    dirIndex = dirOrder[dirIndex]
+    dirSize = numpy.bincount(dirIndex,weights=fileSizeList,minlength=len(firstIndex))
+    dirFileList = groupIndices(dirIndex,len(firstIndex))
+
+    batchList,currentList,currentSize = [],[],0
+    for fileIndex,size in zip(dirFileList,dirSize):
+        if (size>batchSize):
+            for batch in sequentialBatches(fileSizeList[fileIndex],batchSize):
+                batchList.append(fileIndex[batch])
+            continue
+        if (currentList and currentSize+size>batchSize):
+            batchList.append(numpy.sort(numpy.concatenate(currentList)))
+            currentList,currentSize = [],0
+        currentList.append(fileIndex)
+        currentSize += size
+    if (currentList):
+        batchList.append(numpy.sort(numpy.concatenate(currentList)))
+    return batchList
+############################################################
+
+############################################################
+def groupIndices(groupIndex,numGroups):
+    """ Return the indices of the elements in every group, keeping
+    their original order within a group.
+
+    Usage:
+    -----
+    indexList = groupIndices(groupIndex,numGroups)
+    """
+
+    if (numGroups==0):
+        return []
+    order = numpy.argsort(groupIndex,kind='stable')
+    boundaries = numpy.cumsum(numpy.bincount(groupIndex,minlength=numGroups))[:-1]
+    return numpy.split(order,boundaries)
+############################################################
+
+############################################################
+def makeBatches(fileSizeList,batchSize,strategy='sequential',fileNameList=None):
+    """ Split the files to upload into batches of at most batchSize
+    bytes.
+
+    Parameters:
+    ----------
+    fileSizeList : array of int
+        size in bytes of every file.
+    batchSize : float
+        maximum size in bytes of a batch.
+    strategy : str
+        'sequential' keeps the files in the order they are given,
+        'firstFitDecreasing' packs the batches as full as possible, and
+        'directory' keeps the files of a directory in the same batch.
+        Default is 'sequential'.
+    fileNameList : array of str
+        name of every file with full path. Only needed for
+        strategy='directory'.
+
+    Returns:
+    -------
+    batchList : list of array of int
+        indices of the files in every batch.
+
+    Usage:
+    -----
+    batchList = makeBatches(fileSizeList,batchSize,'directory',fileNameList)
+    """
+
+    if (strategy=='sequential'):
+        return sequentialBatches(fileSizeList,batchSize)
+    elif (strategy=='firstFitDecreasing'):
+        return firstFitDecreasingBatches(fileSizeList,batchSize)
+    elif (strategy=='directory'):
+        dirNameList = [os.path.dirname(fileName) for fileName in fileNameList]
+        return directoryBatches(fileSizeList,dirNameList,batchSize)
+    raise ValueError('Unknown batch strategy %s, use one of %s' %(strategy,strategyList))
+############################################################
+
+############################################################
+def batchFill(fileSizeList,batchList,batchSize):
+    """ Return the size of every batch and how full it is.
+
+    Usage:
+    -----
+    batchSizeList,fillList = batchFill(fileSizeList,batchList,batchSize)
+
+    Returns:
+    -------
+    batchSizeList : array of int
+        size in bytes of every batch.
+    fillList : array of float
+        size of every batch as a percentage of batchSize.
+    """
+
+    fileSizeList = numpy.asarray(fileSizeList,dtype='int64')
+    batchSizeList = numpy.asarray([fileSizeList[batch].sum() for batch in batchList],dtype='int64')
+    return batchSizeList,100.0*batchSizeList/batchSize
+############################################################
@@ -0,0 +1,116 @@
+import queue
+import threading
+
+class chunkReader:
+    """ chunkReader class reads a file in chunks on a background thread
+    so that the next chunk is read from disk while the current one is
+    being sent over the network. At most queueSize chunks are kept in
+    memory ahead of the consumer.
+
+    Parameters:
+    ----------
+    fileName : str
+        name of the file with full path.
+    chunkSize : int
+        size of every chunk in bytes. The last chunk can be smaller.
+    offset : int
+        position in the file where reading starts. Default is 0.
+    length : int
+        number of bytes to read from offset. Default is None, which
+        reads until the end of the file.
+    queueSize : int
+        maximum number of chunks read ahead. Default is 2.
+
+    Methods:
+    -------
+    close()
+
+    Usage:
+    -----
+    import chunkReader
+    reader = chunkReader.chunkReader(fileName,chunkSize)
+    for offset,chunk in reader:
+        send(chunk)
+    reader.close()
+    """
+
+    ############################################################
+    def __init__(self,fileName,chunkSize,offset=0,length=None,queueSize=2):
+        self.fileName = fileName
+        self.chunkSize = chunkSize
+        self.offset = offset
+        self.length = length
+        self.queue = queue.Queue(maxsize=queueSize)
+        self.stopEvent = threading.Event()
+        self.thread = threading.Thread(target=self.readChunks,daemon=True)
+        self.thread.start()
+    ############################################################
+
+    ############################################################
+    def readChunks(self):
+        """ Runs on the background thread. Reads the chunks and puts
+        (offset,chunk) in self.queue, followed by None at the end of
+        the range. An exception is put in the queue to be raised in
+        the consumer.
+        """
+
+        try:
+            with open(self.fileName,'rb') as f:
+                f.seek(self.offset)
+                offset,remaining = self.offset,self.length
+                while not(self.stopEvent.is_set()):
+                    size = self.chunkSize if (remaining is None) else min(self.chunkSize,remaining)
+                    chunk = f.read(size) if (size>0) else b''
+                    if not chunk:
+                        break
+                    self.put((offset,chunk))
+                    offset += len(chunk)
+                    if (remaining is not None):
+                        remaining -= len(chunk)
+            self.put(None)
+        except Exception as e:
+            self.put(e)
+    ############################################################
+
+    ############################################################
+    def put(self,item):
+        while not(self.stopEvent.is_set()):
+            try:
+                self.queue.put(item,timeout=0.1)
+                return
+            except queue.Full:
+                pass
+    ############################################################
+
+    ############################################################
+    def __iter__(self):
+        while (True):
+            item = self.queue.get()
+            if (item is None):
+                return
+            if isinstance(item,Exception):
+                raise item
+            yield item
+    ############################################################
+
+    ############################################################
+    def close(self):
+        """ Stop the background thread and release the chunks that
+        were read ahead.
+        """
+
+        self.stopEvent.set()
+        self.thread.join()
+        while not(self.queue.empty()):
+            self.queue.get_nowait()
+    ############################################################
+
+    ############################################################
+    def __enter__(self):
+        return self
+    ############################################################
+
+    ############################################################
+    def __exit__(self,*args):
+        self.close()
+    ############################################################
@@ -0,0 +1,133 @@
+import os
+import zlib
+import numpy
+
+sampleSize = 16*1024*1024
+numSampleFiles = 64
+maxFilesListed = 4096
+storeRatio = 0.95
+fastRatio = 0.8
+
+############################################################
+def sampleFiles(dirName):
+    """ Pick up to numSampleFiles files spread over a directory tree.
+    At most maxFilesListed files are listed, so that a large directory
+    is not walked to the end.
+
+    Parameters:
+    ----------
+    dirName : str
+        directory to sample.
+
+    Returns:
+    -------
+    fileNameList : list of str
+        files with full path.
+
+    Usage:
+    -----
+    fileNameList = sampleFiles(dirName)
+    """
+
+    fileNameList = []
+    for root,dirs,files in os.walk(dirName):
+        fileNameList.extend(os.path.join(root,fileName) for fileName in files)
+        if (len(fileNameList)>=maxFilesListed):
+            break
+    if (len(fileNameList)>numSampleFiles):
+        index = numpy.linspace(0,len(fileNameList)-1,numSampleFiles).astype(int)
+        fileNameList = [fileNameList[i] for i in index]
+    return fileNameList
+############################################################
+
+############################################################
+def readSample(dirName):
+    """ Read about sampleSize bytes from a directory, an equal share
+    from the middle of every file returned by sampleFiles(), to skip
+    file headers.
+
+    Usage:
+    -----
+    data = readSample(dirName)
+    """
+
+    fileNameList = sampleFiles(dirName)
+    if (len(fileNameList)==0):
+        return b''
+    readSize = sampleSize//len(fileNameList)
+    dataList = []
+    for fileName in fileNameList:
+        try:
+            with open(fileName,'rb') as f:
+                f.seek(max(0,(os.fstat(f.fileno()).st_size-readSize)//2))
+                dataList.append(f.read(readSize))
+        except OSError:
+            pass
+    return b''.join(dataList)
+############################################################
+
+############################################################
+def estimateRatio(dirName):
+    """ Estimate how well the data in a directory compresses. The
+    sample from readSample() is compressed with zlib at level 1, and
+    the Shannon entropy of its bytes is computed.
+
+    Parameters:
+    ----------
+    dirName : str
+        directory to sample.
+
+    Returns:
+    -------
+    ratio : float
+        compressed size / sample size. 1 means the data does not
+        compress.
+    entropy : float
+        entropy of the sample in bits per byte, between 0 and 8.
+
+    Usage:
+    -----
+    ratio,entropy = estimateRatio(dirName)
+    """
+
+    data = readSample(dirName)
+    if (len(data)==0):
+        return 1.0,0.0
+    ratio = len(zlib.compress(data,1))/len(data)
+    count = numpy.bincount(numpy.frombuffer(data,dtype=numpy.uint8),minlength=256)
+    p = count[count>0]/len(data)
+    entropy = float(-numpy.sum(p*numpy.log2(p)))
+    return ratio,entropy
+############################################################
+
+############################################################
+def chooseMethod(dirName):
+    """ Choose the 7-Zip compression level of a directory from its
+    estimated compression ratio. Data that does not compress, like
+    compressed camera frames, is stored (-mx0). Data that compresses a
+    little uses the fastest level (-mx1). Otherwise the default level
+    of 7-Zip is used.
+
+    Usage:
+    -----
+    method,ratio,entropy = chooseMethod(dirName)
+
+    Returns:
+    -------
+    method : str
+        7-Zip switch, '-mx0', '-mx1', or None for the default level.
+    ratio : float
+        estimated compression ratio.
+    entropy : float
+        entropy of the sample in bits per byte.
+    """
+
+    ratio,entropy = estimateRatio(dirName)
+    if (ratio>=storeRatio):
+        method = '-mx0'
+    elif (ratio>=fastRatio):
+        method = '-mx1'
+    else:
+        method = None
+    return method,ratio,entropy
+############################################################
@@ -0,0 +1,185 @@
+import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+blockSize = 4*1024*1024
+bufferSize = 8*1024*1024
+numHashThreads = min(8,os.cpu_count() or 1)
+hashExecutor = None
+
+############################################################
+class contentHasher:
+    """ contentHasher class computes the Dropbox content_hash of a
+    stream of bytes as they are read. The data is split into blocks of
+    4 MB, every block is hashed with SHA-256, and the content_hash is
+    the SHA-256 of the concatenated block hashes.
+    See https://www.dropbox.com/developers/reference/content-hash
+
+    The bytes are passed to hashlib as memoryview slices, so no copy of
+    the data is made and hashlib releases the GIL while hashing. When
+    update() gets several complete blocks at once, they are hashed in
+    parallel on numHashThreads threads.
+
+    Parameters:
+    ----------
+    blockHashList : list of str
+        hex digests of the blocks already hashed, as returned by
+        getState(). Used to continue a hash that was interrupted at a
+        block boundary. Default is None.
+
+    Methods:
+    -------
+    update(data)
+    hexdigest()
+    getState()
+
+    Usage:
+    -----
+    import contentHash
+    hasher = contentHash.contentHasher()
+    hasher.update(chunk)
+    contentHash = hasher.hexdigest()
+    """
+
+    ############################################################
+    def __init__(self,blockHashList=None):
+        self.blockDigestList = [bytes.fromhex(h) for h in blockHashList] if blockHashList else []
+        self.block = hashlib.sha256()
+        self.blockPos = 0
+        self.numBytes = len(self.blockDigestList)*blockSize
+    ############################################################
+
+    ############################################################
+    def update(self,data):
+        """ Add data to the hash.
+
+        Usage:
+        -----
+        self.update(data)
+
+        Returns:
+        -------
+        NULL
+        """
+
+        view = memoryview(data).cast('B')
+        pos = 0
+        if (self.blockPos>0):
+            pos = min(blockSize-self.blockPos,len(view))
+            self.addToBlock(view[:pos])
+        numBlocks = (len(view)-pos)//blockSize
+        if (numBlocks>1 and numHashThreads>1):
+            blockList = [view[pos+i*blockSize:pos+(i+1)*blockSize] for i in range(numBlocks)]
+            self.blockDigestList.extend(getHashExecutor().map(blockDigest,blockList))
+            pos += numBlocks*blockSize
+        while (pos<len(view)):
+            size = min(blockSize-self.blockPos,len(view)-pos)
+            self.addToBlock(view[pos:pos+size])
+            pos += size
+        self.numBytes += len(view)
+    ############################################################
+
+    ############################################################
+    def addToBlock(self,view):
+        self.block.update(view)
+        self.blockPos += len(view)
+        if (self.blockPos==blockSize):
+            self.blockDigestList.append(self.block.digest())
+            self.block = hashlib.sha256()
+            self.blockPos = 0
+    ############################################################
+
+    ############################################################
+    def hexdigest(self):
+        """ Return the content_hash of all the data added so far.
+
+        Usage:
+        -----
+        contentHash = self.hexdigest()
+        """
+
+        digestList = list(self.blockDigestList)
+        if (self.blockPos>0):
+            digestList.append(self.block.digest())
+        return hashlib.sha256(b''.join(digestList)).hexdigest()
+    ############################################################
+
+    ############################################################
+    def getState(self):
+        """ Return the hex digests of the blocks hashed so far, or None
+        if the data added so far does not end on a block boundary.
+
+        Usage:
+        -----
+        blockHashList = self.getState()
+        """
+
+        if (self.blockPos>0):
+            return None
+        return [digest.hex() for digest in self.blockDigestList]
+    ############################################################
+############################################################
+
+
+############################################################
+def blockDigest(view):
+    return hashlib.sha256(view).digest()
+############################################################
+
+############################################################
+def getHashExecutor():
+    """ Return the thread pool shared by all the contentHasher
+    objects, creating it the first time.
+    """
+
+    global hashExecutor
+    if (hashExecutor is None):
+        hashExecutor = ThreadPoolExecutor(max_workers=numHashThreads)
+    return hashExecutor
+############################################################
+
+############################################################
+def fileContentHash(fileName,length=None,hasher=None,offset=0):
+    """ Compute the Dropbox content_hash of a file by reading it once.
+
+    Parameters:
+    ----------
+    fileName : str
+        name of the file with full path.
+    length : int
+        number of bytes from offset to hash. Default is None, which
+        hashes until the end of the file.
+    hasher : contentHasher
+        hasher to add the data to. Default is None, which starts a new
+        one.
+    offset : int
+        position in the file where hashing starts. Default is 0.
+
+    Returns:
+    -------
+    hasher : contentHasher
+        hasher with the data of the file added.
+
+    Usage:
+    -----
+    contentHash = fileContentHash(fileName).hexdigest()
+    """
+
+    hasher = contentHasher() if (hasher is None) else hasher
+    buffer = bytearray(bufferSize)
+    view = memoryview(buffer)
+    with open(fileName,'rb') as f:
+        f.seek(offset)
+        remaining = length
+        while (remaining is None or remaining>0):
+            if (remaining is None or remaining>=bufferSize):
+                n = f.readinto(buffer)
+            else:
+                n = f.readinto(view[:remaining])
+            if not n:
+                break
+            hasher.update(view[:n])
+            if (remaining is not None):
+                remaining -= n
+    return hasher
+############################################################
@@ -0,0 +1,149 @@
+import os
+import time
+import shutil
+import copyRange
+import contentHash
+from concurrent.futures import ThreadPoolExecutor
+
+largeFileSize = 64*1024*1024
+numLargeWorkers = 2
+
+############################################################
+def copyFile(srcFile,dstFile,hashFlag=True,progress=None):
+    """ Copy a file with copyRange.copyRange(). If hashFlag is True the
+    Dropbox content_hash is computed from the same read, otherwise the
+    data is copied inside the kernel with copy_file_range where it is
+    available. The permission bits and the access and modification
+    times of srcFile are copied to dstFile.
+
+    Parameters:
+    ----------
+    srcFile : str
+        file to copy.
+    dstFile : str
+        destination file.
+    hashFlag : bool
+        compute the content_hash of the file. Default is True.
+    progress : function
+        called with the number of bytes copied. Default is None.
+
+    Returns:
+    -------
+    contentHash : str
+        Dropbox content_hash of the file, or None if hashFlag is False.
+
+    Usage:
+    -----
+    contentHash = copyFile(srcFile,dstFile)
+    """
+
+    hasher = contentHash.contentHasher() if (hashFlag) else None
+    stat = os.stat(srcFile)
+    with open(srcFile,'rb',buffering=0) as fIn, open(dstFile,'wb',buffering=0) as fOut:
+        copyRange.copyRange(fIn.fileno(),fOut.fileno(),0,0,stat.st_size,hasher=hasher,progress=progress)
+    shutil.copymode(srcFile,dstFile)
+    os.utime(dstFile,ns=(stat.st_atime_ns,stat.st_mtime_ns))
+    return hasher.hexdigest() if (hashFlag) else None
+############################################################
+
+############################################################
+def moveFile(srcFile,dstFile,hashFlag=True,progress=None):
+    """ Move a file with os.replace(), which renames it without
+    copying any data. srcFile and dstFile have to be on the same file
+    system. If hashFlag is True the Dropbox content_hash is computed by
+    reading the moved file.
+
+    Usage:
+    -----
+    contentHash = moveFile(srcFile,dstFile)
+
+    Returns:
+    -------
+    contentHash : str
+        Dropbox content_hash of the file, or None if hashFlag is False.
+    """
+
+    os.replace(srcFile,dstFile)
+    hashValue = contentHash.fileContentHash(dstFile).hexdigest() if (hashFlag) else None
+    if (progress is not None):
+        progress(os.path.getsize(dstFile))
+    return hashValue
+############################################################
+
+############################################################
+def sameDevice(fileNameList,dirName):
+    """ Check which files are on the same file system as dirName, by
+    comparing st_dev.
+
+    Usage:
+    -----
+    moveFlagList = sameDevice(fileNameList,dirName)
+
+    Returns:
+    -------
+    moveFlagList : list of bool
+        True for the files that can be moved to dirName with
+        moveFile().
+    """
+
+    dirDevice = os.stat(dirName).st_dev
+    moveFlagList = []
+    for fileName in fileNameList:
+        try:
+            moveFlagList.append(os.stat(fileName).st_dev==dirDevice)
+        except OSError:
+            moveFlagList.append(False)
+    return moveFlagList
+############################################################
+
+############################################################
+def copyFiles(srcFileList,dstFileList,fileSizeList,numWorkers=8,hashFlag=True,progress=None,moveFlagList=None):
+    """ Copy a list of files with copyFile(). The files with True in
+    moveFlagList are moved with moveFile() instead. Files smaller than
+    largeFileSize are copied by a pool of numWorkers threads, so that
+    the time spent opening and closing files overlaps. Larger files are
+    copied by a separate pool of numLargeWorkers threads, so that a few
+    large copies do not compete for the disk.
+
+    Parameters:
+    ----------
+    srcFileList : list of str
+        files to copy.
+    dstFileList : list of str
+        destination files.
+    fileSizeList : list of int
+        size in bytes of every file.
+    numWorkers : int
+        number of small files copied at the same time. Default is 8.
+    hashFlag : bool
+        compute the content_hash of every file. Default is True.
+    progress : function
+        called with the number of bytes copied. Default is None.
+    moveFlagList : list of bool
+        True for the files to move instead of copy, see sameDevice().
+        Default is None, which copies every file.
+
+    Returns:
+    -------
+    hashList : list of str
+        content_hash of every file, None if hashFlag is False.
+    duration : float
+        time in seconds taken to copy all the files.
+
+    Usage:
+    -----
+    import copyEngine
+    hashList,duration = copyEngine.copyFiles(srcFileList,dstFileList,fileSizeList)
+    """
+
+    tic = time.time()
+    if (moveFlagList is None):
+        moveFlagList = [False]*len(srcFileList)
+    with ThreadPoolExecutor(max_workers=max(1,numWorkers)) as smallExecutor, ThreadPoolExecutor(max_workers=numLargeWorkers) as largeExecutor:
+        futureList = []
+        for srcFile,dstFile,fileSize,moveFlag in zip(srcFileList,dstFileList,fileSizeList,moveFlagList):
+            executor = largeExecutor if (fileSize>=largeFileSize) else smallExecutor
+            futureList.append(executor.submit(moveFile if (moveFlag) else copyFile,srcFile,dstFile,hashFlag,progress))
+        hashList = [future.result() for future in futureList]
+    return hashList,time.time()-tic
+############################################################
@@ -0,0 +1,138 @@
+import io
+import os
+import errno
+import threading
+
+stepSize = 64*1024*1024
+bufferSize = 8*1024*1024
+fallbackErrors = set([errno.ENOSYS,errno.EXDEV,errno.EINVAL,errno.EOPNOTSUPP,getattr(errno,'ENOTSUP',errno.EOPNOTSUPP)])
+threadLocal = threading.local()
+
+############################################################
+def copyFileRangeStep(inFd,outFd,inOffset,outOffset,count):
+    return os.copy_file_range(inFd,outFd,count,inOffset,outOffset)
+############################################################
+
+############################################################
+def sendfileStep(inFd,outFd,inOffset,outOffset,count):
+    os.lseek(outFd,outOffset,os.SEEK_SET)
+    return os.sendfile(outFd,inFd,inOffset,count)
+############################################################
+
+############################################################
+def getBuffer():
+    """ Return the copy buffer of the calling thread, creating it the
+    first time. Every thread reuses the same bufferSize bytes.
+    """
+
+    if not(hasattr(threadLocal,'buffer')):
+        threadLocal.buffer = bytearray(bufferSize)
+    return threadLocal.buffer
+############################################################
+
+############################################################
+def kernelMethods():
+    """ Return the kernel copy functions available on this platform,
+    in the order they are tried.
+    """
+
+    methodList = []
+    if hasattr(os,'copy_file_range'):
+        methodList.append(copyFileRangeStep)
+    if hasattr(os,'sendfile'):
+        methodList.append(sendfileStep)
+    return methodList
+############################################################
+
+############################################################
+def copyRange(inFd,outFd,inOffset,outOffset,length,hasher=None,progress=None):
+    """ Copy length bytes of the file inFd starting at inOffset to the
+    file outFd starting at outOffset.
+
+    The data is copied inside the kernel with os.copy_file_range, or
+    with os.sendfile if copy_file_range is not available or not
+    supported between the two files. Otherwise, or if the data also
+    needs to be hashed, it is read with readinto into a buffer of
+    bufferSize bytes that is reused by the thread, so the memory used
+    does not depend on length.
+
+    Parameters:
+    ----------
+    inFd : int
+        file descriptor of the file to read.
+    outFd : int
+        file descriptor of the file to write.
+    inOffset : int
+        position in inFd where reading starts.
+    outOffset : int
+        position in outFd where writing starts.
+    length : int
+        number of bytes to copy.
+    hasher : object
+        object with an update() method, e.g. hashlib.sha256() or
+        contentHash.contentHasher(), that is given the data as it is
+        copied. Default is None.
+    progress : function
+        called with the number of bytes copied after every step, e.g.
+        tqdm.update. Default is None.
+
+    Returns:
+    -------
+    NULL
+
+    Usage:
+    -----
+    import copyRange
+    copyRange.copyRange(inFile.fileno(),outFile.fileno(),offset,0,length)
+    """
+
+    done = 0
+    methodList = kernelMethods() if (hasher is None) else []
+    while (done<length and methodList):
+        count = min(stepSize,length-done)
+        try:
+            n = methodList[0](inFd,outFd,inOffset+done,outOffset+done,count)
+        except OSError as e:
+            if (e.errno not in fallbackErrors):
+                raise
+            methodList.pop(0)
+            continue
+        if (n==0):
+            raise IOError('End of file before offset %d' %(inOffset+length))
+        done += n
+        if (progress is not None):
+            progress(n)
+    if (done<length):
+        copyBuffer(inFd,outFd,inOffset+done,outOffset+done,length-done,hasher,progress)
+############################################################
+
+############################################################
+def copyBuffer(inFd,outFd,inOffset,outOffset,length,hasher=None,progress=None):
+    """ Copy length bytes from inFd to outFd through the reused buffer
+    of the calling thread. Used by copyRange() when no kernel copy can
+    be used.
+
+    Usage:
+    -----
+    copyBuffer(inFd,outFd,inOffset,outOffset,length,hasher,progress)
+    """
+
+    view = memoryview(getBuffer())
+    inFile = io.FileIO(inFd,'rb',closefd=False)
+    outFile = io.FileIO(outFd,'wb',closefd=False)
+    inFile.seek(inOffset)
+    outFile.seek(outOffset)
+    remaining = length
+    while (remaining>0):
+        n = inFile.readinto(view[:min(bufferSize,remaining)])
+        if not n:
+            raise IOError('End of file before offset %d' %(inOffset+length))
+        pos = 0
+        while (pos<n):
+            pos += outFile.write(view[pos:n])
+        if (hasher is not None):
+            hasher.update(view[:n])
+        remaining -= n
+        if (progress is not None):
+            progress(n)
+############################################################
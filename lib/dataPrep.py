@@ -1,9 +1,20 @@
 import os
+import re
+import json
 import numpy
+import hashlib
 import pandas
 import utils
+import scanDir
+import scanIndex
+import manifest
+import copyRange
+import contentHash
 import datetime
 from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+splitPattern = re.compile(r'_split_\d{4}$')
 
 class dataPrep:
     """ dataPrep class has the following functions and variables
@@ -20,15 +31,35 @@ class dataPrep:
         size limit for files. If any file is bigger that this it is
         split into smaller pieces. Default is 100 GB.
     chunkSizeSplit : float
-        when splitting files size of chunk to keep in memory. Default is
-        1024 MB.
+        when splitting files the size of every split is a multiple of
+        this size. Default is 1024 MB.
+    indexFile : str
+        SQLite file where directory scans are kept so that a rerun only
+        lists the directories that changed. Default is None (no index).
+    splitMode : str
+        'sequential' writes the parts of a large file one after the
+        other, 'parallel' writes them at the same time, and 'inPlace'
+        writes them from the end of the file and truncates the file
+        after every part so that at most one extra part is on disk.
+        Default is 'sequential'.
+    numSplitWorkers : int
+        number of parts written at the same time when splitMode is
+        'parallel'. Default is 4.
+    virtualSplit : bool
+        if True, large files are not split on disk. The manifest lists
+        the byte range of every part and dropboxAPI uploads the ranges
+        straight from the original file. Only for the API upload.
+        Default is False.
         
     Methods:
     -------
     checkForLargeFiles()
     getFileList()
-    getFilesinDir(dirName)
+    getFilesinDir(inputDir,outputDir)
     spitFile(fileName)
+    splitFileInPlace(fileName)
+    splitRanges(fileSize)
+    splitPart(fileName,splitFile,offset,length)
     
     Attributes:
     ----------
@@ -43,6 +74,10 @@ class dataPrep:
         list of all the files that need to be uploaded.
     fileSizeList : list
         list of the size of all the files.
+    manifest : manifest.uploadManifest
+        final list of files to upload after splitting, with their size
+        and Dropbox destination. Pass it to dropboxBatch.dropboxApp or
+        dropboxBatch.dropboxAPI to avoid scanning the files again.
         
     Usage:
     -----
@@ -55,8 +90,8 @@ class dataPrep:
         fileSizeLimit_GB=64,
         chunkSizeSplit_MB=256)
     The files and directories in excel sheet will be split into
-    smaller pieces if they are larger than 64 GB. During splitting
-    256 MB of data will be loaded into the memory at a time.
+    smaller pieces if they are larger than 64 GB. The size of every
+    piece is a multiple of 256 MB.
     
     # Example 2
     dp = dataPrep.dataPrep(
@@ -67,7 +102,7 @@ class dataPrep:
     """
     
     ####################################################################
-    def __init__(self,excelName,sheetName,fileSizeLimit_GB=100,chunkSizeSplit_MB=1024):
+    def __init__(self,excelName,sheetName,fileSizeLimit_GB=100,chunkSizeSplit_MB=1024,indexFile=None,splitMode='sequential',numSplitWorkers=4,virtualSplit=False):
         """ Creates attribute variables and makes a log file
         dataPrep.log in the logs directory.
         
@@ -83,16 +118,26 @@ class dataPrep:
         self.names = ['inputFile','outputDir']
         self.fileSizeLimit = fileSizeLimit_GB*1024*1024*1024
         self.chunkSizeSplit = chunkSizeSplit_MB*1024*1024
+        self.splitMode = splitMode
+        self.numSplitWorkers = numSplitWorkers
+        self.virtualSplit = virtualSplit
+        if (self.virtualSplit and 'API' not in self.sheetName):
+            raise ValueError('virtualSplit only works with the Dropbox API upload')
         
         self.chunksInEachSplit = int(numpy.ceil(self.fileSizeLimit/self.chunkSizeSplit))
         self.df = pandas.read_excel(self.excelName,sheet_name=self.sheetName,names=self.names)
+        self.index = scanIndex.scanIndex(indexFile) if indexFile else None
+        self.checkpointDir = './logs/dataPrep/checkpoints'
+        self.loadCheckpoints()
         
         print ('Stage 1 - Data preparation')
         self.logFile = open('./logs/dataPrep/dataPrep.log','w')
         self.getFileList()
         self.checkForLargeFiles()
         self.logFile.close()
-        os.rename('./logs/dataPrep/dataPrep.log','./logs/dataPrep/'+datetime.datetime.now().strftime("%Y%m%d_%H%M%S")+'.log')
+        timeStamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        os.rename('./logs/dataPrep/dataPrep.log','./logs/dataPrep/'+timeStamp+'.log')
+        self.manifest.save('./logs/dataPrep/'+timeStamp+'_manifest.json')
     ####################################################################
     
     ####################################################################
@@ -114,31 +159,32 @@ class dataPrep:
             List of all the files uploading to Dropbox.
         self.fileSizeList : list
             List of corresponding file size in bytes.
+        self.manifest : manifest.uploadManifest
+            The files with their size and Dropbox destination.
         """
         
-        fileNameList,fileSizeList = [],[]
-        for inputFile in self.df.values[:,0]:
+        self.manifest = manifest.uploadManifest()
+        for inputFile,outputDir in self.df.values:
+            self.manifest.addRoot(outputDir)
             if (os.path.isfile(inputFile)):
                 fileSize = os.path.getsize(inputFile)
-                fileNameList.append(inputFile)
-                fileSizeList.append(fileSize)
+                self.manifest.addFile(inputFile,fileSize,outputDir+'/'+utils.getFileName(inputFile),outputDir)
             elif (os.path.isdir(inputFile)):
                 inputDir = inputFile
-                tempFileNameList,tempFileSizeList = self.getFilesinDir(inputDir)
-                for a,b in zip(tempFileNameList,tempFileSizeList):
-                    fileNameList.append(a)
-                    fileSizeList.append(b)
-        self.fileNameList = fileNameList
-        self.fileSizeList = fileSizeList
+                for a,b,c,d in zip(*self.getFilesinDir(inputDir,outputDir)):
+                    self.manifest.addFile(a,b,c,d)
+        self.fileNameList = self.manifest.fileNameList
+        self.fileSizeList = self.manifest.fileSizeList
     ####################################################################
     
     ####################################################################
-    def getFilesinDir(self,inputDir):
-        """ Creates a list of files inside a directory
+    def getFilesinDir(self,inputDir,outputDir):
+        """ Creates a list of files inside a directory and the
+        corresponding files in the Dropbox directory.
         
         Usage:
         -----
-        self.getFilesinDir(dir)
+        self.getFilesinDir(inputDir,outputDir)
 
         Returns:
         -------
@@ -146,23 +192,30 @@ class dataPrep:
             List of all the files inside dir.
         fileSizeList : list
             List of the corresponding file size in bytes.
+        dropboxFileList : list
+            List of corresponding files in the Dropbox directory.
+        dropboxDirList : list
+            List of corresponding directories in the Dropbox directory.
         """
         
-        fileNameList,fileSizeList = [],[]
-        for root,dirs,files in os.walk(inputDir):
-            for name in files:
-                fileName = os.path.join(root,name)
-                fileSize = os.path.getsize(fileName)
-                fileNameList.append(fileName)
-                fileSizeList.append(fileSize)
-        return fileNameList,fileSizeList
+        return scanDir.getFilesInDir(inputDir,outputDir,scanDir.exclusionList,index=self.index)
     ####################################################################
     
     ####################################################################
     def checkForLargeFiles(self):
         """ Scans through all the files in self.fileNameList and splits
         it if the file size is bigger than self.fileSizeLimit. Calls
-        self.splitFile(file) if the file is large.
+        self.splitFile(file) if the file is large, and replaces the
+        file in self.manifest with its split files. With
+        self.virtualSplit the file is not split on disk, and the
+        manifest gets the byte range of every part instead. A file with
+        an interrupted in-place split is split again whatever its
+        current size, and its parts found by the scan are left out as
+        they are added back by self.splitFile(). The sidecar file
+        fileName.split.json written next to the splits is uploaded with
+        them. For a virtual split the sidecar has no content_hash.
+        Files that are already splits, like the archive volumes written
+        by preProcess/2_zipDir.py, are never split again.
         
         Usage:
         -----
@@ -173,9 +226,35 @@ class dataPrep:
         NULL
         """
         
-        for fileName,fileSize in zip(self.fileNameList,self.fileSizeList):
-            if (fileSize>self.fileSizeLimit):
-                self.splitFile(fileName)
+        partSet = set()
+        for fileName,checkpoint in self.checkpointDict.items():
+            partSet.update(fileName+splitName for splitName in self.splitRanges(checkpoint['fileSize'],checkpoint['splitSize'])[0])
+        splitManifest = manifest.uploadManifest()
+        splitManifest.rootDirList = list(self.manifest.rootDirList)
+        for fileName,fileSize,dropboxFile,dropboxDir in self.manifest.entries():
+            if (fileName in partSet):
+                continue
+            elif (fileSize>self.fileSizeLimit and splitPattern.search(fileName) and fileName not in self.checkpointDict):
+                print ('%s is already a split file, it is not split again' %(fileName))
+                self.logFile.write('%s\tAlready split %s\n' %(utils.timestamp(),fileName))
+                splitManifest.addFile(fileName,fileSize,dropboxFile,dropboxDir)
+            elif (fileSize>self.fileSizeLimit and self.virtualSplit):
+                splitNameList,offsetList,splitSizeList = self.splitRanges(fileSize)
+                self.logFile.write('%s\tVirtual split %s into %d parts\n' %(utils.timestamp(),fileName,len(splitNameList)))
+                for splitName,offset,splitSize in zip(splitNameList,offsetList,splitSizeList):
+                    splitManifest.addFile(fileName,splitSize,dropboxFile+splitName,dropboxDir,offset)
+                sidecarFile = utils.writeSplitSidecar(fileName,fileSize,[fileName+splitName for splitName in splitNameList],splitSizeList,[None]*len(splitNameList))
+                splitManifest.addFile(sidecarFile,os.path.getsize(sidecarFile),dropboxFile+sidecarFile[len(fileName):],dropboxDir)
+            elif (fileSize>self.fileSizeLimit or fileName in self.checkpointDict):
+                splitFileList,splitSizeList = self.splitFile(fileName)
+                sidecarFile = fileName+'.split.json'
+                for splitFile,splitSize in zip(splitFileList+[sidecarFile],splitSizeList+[os.path.getsize(sidecarFile)]):
+                    splitManifest.addFile(splitFile,splitSize,dropboxFile+splitFile[len(fileName):],dropboxDir)
+            else:
+                splitManifest.addFile(fileName,fileSize,dropboxFile,dropboxDir)
+        self.manifest = splitManifest
+        self.fileNameList = self.manifest.fileNameList
+        self.fileSizeList = self.manifest.fileSizeList
     ####################################################################
     
     ####################################################################
@@ -185,6 +264,14 @@ class dataPrep:
         chunks of self.fileSizeLimit and saves it in the same directory.
         fileName_split_0001, fileName_split_0002, ... is added at the
         end of each split. The original file is deleted after splitting.
+        The size and Dropbox content_hash of every split are written to
+        the sidecar file fileName.split.json. Every part covers its own
+        byte range of the file, given by self.splitRanges(), and is
+        written by self.splitPart(). With
+        self.splitMode='parallel' the parts are written at the same time
+        by self.numSplitWorkers threads. With self.splitMode='inPlace',
+        or to finish an interrupted in-place split, the work is done by
+        self.splitFileInPlace().
         
         Usage:
         -----
@@ -192,30 +279,222 @@ class dataPrep:
         
         Returns:
         -------
-        NULL
+        splitFileList : list
+            List of the split files.
+        splitSizeList : list
+            List of the corresponding split file size in bytes.
         """
         
+        if (self.splitMode=='inPlace' or fileName in self.checkpointDict):
+            return self.splitFileInPlace(fileName)
         fileSize = os.path.getsize(fileName)
-        numFiles = int(fileSize/self.fileSizeLimit)+1
-        print ('Splitting %s into %d parts' %(fileName,numFiles))
-        self.logFile.write('%s\tSplit %s into %d parts\n' %(utils.timestamp(),fileName,numFiles))
-
-        numChunksToRead,splitNum,chunkNum = int(numpy.ceil(fileSize/self.chunkSizeSplit)),1,0
-        outputFileName = fileName
-        infile = open(fileName,'rb')
-        outFile = open(outputFileName+'_split_'+str(splitNum).zfill(4),'wb')
-        for i in tqdm(range(numChunksToRead)):
-            chunk = infile.read(self.chunkSizeSplit)
-            chunkNum += 1
-            if (chunkNum<=self.chunksInEachSplit):
-                outFile.write(chunk)
-            else:
-                outFile.close()
-                splitNum += 1
-                outFile = open(outputFileName+'_split_'+str(splitNum).zfill(4),'wb')
-                outFile.write(chunk)
-                chunkNum = 1
-        outFile.close()
-        infile.close()
+        splitNameList,offsetList,splitSizeList = self.splitRanges(fileSize)
+        print ('Splitting %s into %d parts' %(fileName,len(splitNameList)))
+        self.logFile.write('%s\tSplit %s into %d parts\n' %(utils.timestamp(),fileName,len(splitNameList)))
+        
+        splitFileList = [fileName+splitName for splitName in splitNameList]
+        numWorkers = self.numSplitWorkers if (self.splitMode=='parallel') else 1
+        with tqdm(total=fileSize,unit='B',unit_scale=True) as progressBar:
+            with ThreadPoolExecutor(max_workers=numWorkers) as executor:
+                futureList = [executor.submit(self.splitPart,fileName,splitFile,offset,size,progressBar) for splitFile,offset,size in zip(splitFileList,offsetList,splitSizeList)]
+                for future in as_completed(futureList):
+                    splitFile,splitHash = future.result()
+                    self.logFile.write('%s\tWrote %s\t%s\n' %(utils.timestamp(),splitFile,splitHash))
+        hashList = [future.result()[1] for future in futureList]
+        utils.writeSplitSidecar(fileName,fileSize,splitFileList,splitSizeList,hashList)
         os.remove(fileName)
+        return splitFileList,splitSizeList
+    ####################################################################
+    
+    ####################################################################
+    def splitFileInPlace(self,fileName):
+        """ Split a large file without needing free space for a second
+        copy of it. The parts are written from the end of the file
+        backwards, and after every part is written and flushed to disk
+        the file is truncated at the start of that part. The first
+        part is the file itself, renamed. The extra disk space used is
+        at most one part.
+        
+        A checkpoint with the original size of the file and the split
+        size is written before the first part, and the content_hash of
+        every part, read back from the written part before the file is
+        truncated, is added to it as the part is finished. If the split
+        is interrupted, the parts at or after the current end of the
+        file are complete, and the next run continues from there with
+        the same split size.
+        
+        Usage:
+        -----
+        self.splitFileInPlace(file)
+        
+        Returns:
+        -------
+        splitFileList : list
+            List of the split files.
+        splitSizeList : list
+            List of the corresponding split file size in bytes.
+        """
+        
+        checkpoint = self.checkpointDict.get(fileName)
+        if (checkpoint is None):
+            checkpoint = {'fileName':fileName,'fileSize':os.path.getsize(fileName),'splitSize':self.chunksInEachSplit*self.chunkSizeSplit,'hashDict':{}}
+            self.saveCheckpoint(checkpoint)
+        else:
+            checkpoint.setdefault('hashDict',{})
+            print ('Resuming split of %s' %(fileName))
+            self.logFile.write('%s\tResume split of %s\n' %(utils.timestamp(),fileName))
+        splitNameList,offsetList,splitSizeList = self.splitRanges(checkpoint['fileSize'],checkpoint['splitSize'])
+        splitFileList = [fileName+splitName for splitName in splitNameList]
+        print ('Splitting %s into %d parts in place' %(fileName,len(splitFileList)))
+        self.logFile.write('%s\tSplit %s into %d parts in place\n' %(utils.timestamp(),fileName,len(splitFileList)))
+        
+        currentSize = os.path.getsize(fileName)
+        with tqdm(total=currentSize,unit='B',unit_scale=True) as progressBar:
+            for splitFile,offset,size in reversed(list(zip(splitFileList,offsetList,splitSizeList))):
+                if (offset>=currentSize):
+                    continue
+                if (offset==0):
+                    hasher = contentHash.fileContentHash(fileName,length=size)
+                    progressBar.update(size)
+                    checkpoint['hashDict'][splitFile] = hasher.hexdigest()
+                    self.saveCheckpoint(checkpoint)
+                    os.replace(fileName,splitFile)
+                else:
+                    with open(fileName,'rb',buffering=0) as inFile, open(splitFile,'wb',buffering=0) as outFile:
+                        copyRange.copyRange(inFile.fileno(),outFile.fileno(),offset,0,size,progress=progressBar.update)
+                        os.fsync(outFile.fileno())
+                    hasher = contentHash.fileContentHash(splitFile)
+                    with open(fileName,'r+b') as f:
+                        f.truncate(offset)
+                        os.fsync(f.fileno())
+                    checkpoint['hashDict'][splitFile] = hasher.hexdigest()
+                    self.saveCheckpoint(checkpoint)
+                self.logFile.write('%s\tWrote %s\t%s\n' %(utils.timestamp(),splitFile,checkpoint['hashDict'][splitFile]))
+        hashList = [checkpoint['hashDict'].get(splitFile) or contentHash.fileContentHash(splitFile).hexdigest() for splitFile in splitFileList]
+        utils.writeSplitSidecar(fileName,checkpoint['fileSize'],splitFileList,splitSizeList,hashList)
+        self.removeCheckpoint(fileName)
+        return splitFileList,splitSizeList
+    ####################################################################
+    
+    ####################################################################
+    def checkpointFile(self,fileName):
+        return os.path.join(self.checkpointDir,hashlib.sha1(fileName.encode('utf-8')).hexdigest()+'.json')
+    ####################################################################
+    
+    ####################################################################
+    def loadCheckpoints(self):
+        """ Read the checkpoints of in-place splits that were
+        interrupted. If the file no longer exists but its first part
+        does, the split was interrupted after the last part was renamed,
+        and the sidecar file is written from the part hashes in the
+        checkpoint before the checkpoint is removed. If neither exists,
+        only the checkpoint is removed.
+        
+        Usage:
+        -----
+        self.loadCheckpoints()
+        
+        Returns:
+        -------
+        NULL
+        
+        Creates:
+        -------
+        self.checkpointDict : dict
+            file name -> checkpoint of every interrupted split.
+        """
+        
+        self.checkpointDict = {}
+        utils.mkdirs([self.checkpointDir])
+        for name in os.listdir(self.checkpointDir):
+            if not(name.endswith('.json')):
+                continue
+            with open(os.path.join(self.checkpointDir,name),'r') as f:
+                checkpoint = json.load(f)
+            fileName = checkpoint['fileName']
+            if (os.path.isfile(fileName)):
+                self.checkpointDict[fileName] = checkpoint
+                continue
+            splitNameList,offsetList,splitSizeList = self.splitRanges(checkpoint['fileSize'],checkpoint['splitSize'])
+            splitFileList = [fileName+splitName for splitName in splitNameList]
+            if (os.path.isfile(splitFileList[0]) and not(os.path.isfile(fileName+'.split.json'))):
+                print ('Finishing split of %s' %(fileName))
+                hashDict = checkpoint.get('hashDict',{})
+                hashList = [hashDict.get(splitFile) or contentHash.fileContentHash(splitFile).hexdigest() for splitFile in splitFileList]
+                utils.writeSplitSidecar(fileName,checkpoint['fileSize'],splitFileList,splitSizeList,hashList)
+            os.remove(os.path.join(self.checkpointDir,name))
+    ####################################################################
+    
+    ####################################################################
+    def saveCheckpoint(self,checkpoint):
+        checkpointFile = self.checkpointFile(checkpoint['fileName'])
+        with open(checkpointFile+'.tmp','w') as f:
+            json.dump(checkpoint,f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(checkpointFile+'.tmp',checkpointFile)
+        self.checkpointDict[checkpoint['fileName']] = checkpoint
+    ####################################################################
+    
+    ####################################################################
+    def removeCheckpoint(self,fileName):
+        os.remove(self.checkpointFile(fileName))
+        self.checkpointDict.pop(fileName,None)
+    ####################################################################
+    
+    ####################################################################
+    def splitRanges(self,fileSize,splitSize=None):
+        """ Divide a file of fileSize bytes into parts of splitSize
+        bytes. Default splitSize is
+        self.chunksInEachSplit*self.chunkSizeSplit.
+        
+        Usage:
+        -----
+        splitNameList,offsetList,splitSizeList = self.splitRanges(fileSize)
+        
+        Returns:
+        -------
+        splitNameList : list
+            _split_0001, _split_0002, ... to add at the end of the file
+            name of every part.
+        offsetList : list
+            position of every part in the file.
+        splitSizeList : list
+            size of every part in bytes.
+        """
+        
+        if (splitSize is None):
+            splitSize = self.chunksInEachSplit*self.chunkSizeSplit
+        numFiles = max(1,int(numpy.ceil(fileSize/splitSize)))
+        splitNameList = ['_split_'+str(splitNum).zfill(4) for splitNum in range(1,numFiles+1)]
+        offsetList = [i*splitSize for i in range(numFiles)]
+        splitSizeList = [min(splitSize,fileSize-offset) for offset in offsetList]
+        return splitNameList,offsetList,splitSizeList
+    ####################################################################
+    
+    ####################################################################
+    def splitPart(self,fileName,splitFile,offset,length,progressBar=None):
+        """ Write length bytes of fileName starting at offset to
+        splitFile with copyRange, inside the kernel where possible, and
+        compute the Dropbox content_hash of the split by reading it
+        back, so the hash is of the bytes on disk. Every call opens its
+        own file handles so that several parts can be written at the
+        same time.
+        
+        Usage:
+        -----
+        self.splitPart(fileName,splitFile,offset,length)
+        
+        Returns:
+        -------
+        splitFile : str
+            name of the split file that was written.
+        splitHash : str
+            Dropbox content_hash of the split file.
+        """
+        
+        progress = progressBar.update if (progressBar is not None) else None
+        with open(fileName,'rb',buffering=0) as inFile, open(splitFile,'wb',buffering=0) as outFile:
+            copyRange.copyRange(inFile.fileno(),outFile.fileno(),offset,0,length,progress=progress)
+        return splitFile,contentHash.fileContentHash(splitFile).hexdigest()
     ####################################################################
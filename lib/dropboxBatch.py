@@ -2,23 +2,42 @@ import os
 import numpy
 import pandas
 import psutil
-import shutil
 import utils
+import scanDir
+import scanIndex
+import chunkReader
+import uploadJournal
+import moveJournal
+import contentHash
+import dropboxList
+import batchPlanner
+import syncMonitor
+import copyEngine
+import hashCache
 import time
 import dropbox
+import requests
 import datetime
+import collections
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 
-exclusionList = [
-    'desktop.ini',\
-    'thumbs.db',\
-    'Thumbs.db',\
-    '.ds_store',\
-    '.DS_Store',\
-    '._.DS_Store',\
-    '.dropbox',\
-    '.dropbox.attr'\
-    ]
+exclusionList = scanDir.exclusionList
+
+############################################################
+class contentHashError(ValueError):
+    """ Raised when a file committed to Dropbox has a different
+    content_hash than the bytes that were sent. metadata is the
+    committed file, so that a new attempt can replace that revision.
+    """
+
+    ############################################################
+    def __init__(self,message,metadata):
+        ValueError.__init__(self,message)
+        self.metadata = metadata
+    ############################################################
+############################################################
 
 ############################################################
 class dropboxApp:
@@ -41,18 +60,75 @@ class dropboxApp:
         is 120 s. If Dropbox is busy then the same batch will continue
         to upload. Otherwise, work on next batch is started.
     r_wSpeedCutOff : float
-        Average disk r/w speed cutoff to check Dropbox availability. If
-        r/w < 0.5 (Default), Dropbox is free to work on next batch,
-        otherwise uploading of same batch continues.
+        Average disk r/w and upload speed of Dropbox in MB/s below which
+        Dropbox is idle. If r/w < 0.5 (Default) for idleWindow_s, the
+        files of the batch are checked with the API, otherwise uploading
+        of same batch continues.
+    idleWindow_s : float
+        Time in seconds the speed has to stay below r_wSpeedCutOff.
+        Default is 120 s.
+    pollTime_s : float
+        Time in seconds before the files are checked again with the API
+        if the batch is not complete. It is doubled after every check
+        that finds no new file, up to sleepTime_min. Default is 60 s.
+    stagingBudget_GB : float
+        Local disk space in GB that the copied batches may use at the
+        same time. The next batch is copied while the current batch
+        syncs if both fit in this budget and storageFree() allows it.
+        Default is None, which is 2*batchSize_GB. Use batchSize_GB to
+        copy one batch at a time.
+    numCopyWorkers : int
+        number of small files copied to the local Dropbox directory at
+        the same time. Default is 8.
+    verifyHash : bool
+        If True (Default), the content_hash of every file is computed
+        while it is copied and compared with the file on Dropbox. If
+        False, only the size is compared, and large files are copied
+        inside the kernel with copy_file_range.
+    moveMode : bool
+        If True, files on the same file system as dropboxDir are moved
+        into the Dropbox directory with a rename instead of being
+        copied and deleted after they are verified. Default is False.
+    rollback : bool
+        If True (Default), moved files that could not be verified on
+        Dropbox are moved back to their source location.
+    skipUploaded : bool
+        If True, files that are already on Dropbox with the same size
+        and content_hash are not uploaded again. Default is False.
+    deleteSkipped : bool
+        If True, the source of a file that is skipped because it is
+        already on Dropbox is deleted. Default is False.
+    hashCacheFile : str
+        SQLite file where the content_hash of local files is kept so
+        that unchanged files are not read again. Default is None (no
+        cache between runs).
+    moveJournalFile : str
+        json file where the moved files are recorded until they are
+        verified, so that a rerun after a crash can move them back.
+        Default is None (only kept in memory).
     accessToken : str
         Access token to access Dropbox using API.
+    indexFile : str
+        SQLite file where directory scans are kept so that a rerun only
+        lists the directories that changed. Default is None (no index).
+    manifest : manifest.uploadManifest
+        list of files prepared by dataPrep. If given, the excel sheet is
+        not read and the files are not scanned again. Default is None.
+    batchStrategy : str
+        How files are packed into batches - 'sequential' keeps the
+        order of the files, 'firstFitDecreasing' makes fewer and fuller
+        batches, 'directory' keeps every directory in one batch.
+        Default is 'sequential'.
         
     Methods:
     -------
     getFileList()
     getFilesInDir(inputDir,outputDir)
+    removeUploaded()
     makeBatches()
     uploadFiles()
+    stageBatch(i)
+    canStage(i,j)
     checkResource()
     droboxFree()
     storageFree()
@@ -118,7 +194,7 @@ class dropboxApp:
     """
     
     ############################################################
-    def __init__(self,excelName,sheetName,dropboxDir,accessToken,batchSize_GB=500,sleepTime_min=30,batchTimeLimit_hour=12):
+    def __init__(self,excelName,sheetName,dropboxDir,accessToken,batchSize_GB=500,sleepTime_min=30,batchTimeLimit_hour=12,indexFile=None,manifest=None,batchStrategy='sequential',r_wSpeedCutOff=0.5,idleWindow_s=120,pollTime_s=60,stagingBudget_GB=None,numCopyWorkers=8,verifyHash=True,moveMode=False,rollback=True,skipUploaded=False,deleteSkipped=False,hashCacheFile=None,moveJournalFile=None):
         """ Creates attribute variables and makes a log file
         dropboxApp.log in the logs directory.
         
@@ -132,15 +208,35 @@ class dropboxApp:
         self.batchSize = batchSize_GB*1024*1024*1024
         self.sleepTime_min = sleepTime_min
         self.batchTimeLimit_hour = batchTimeLimit_hour
+        self.batchStrategy = batchStrategy
+        self.pollTime_s = pollTime_s
+        self.stagingBudget = 2*self.batchSize if (stagingBudget_GB is None) else stagingBudget_GB*1024*1024*1024
+        self.numCopyWorkers = numCopyWorkers
+        self.verifyHash = verifyHash
+        self.moveMode = moveMode
+        self.rollback = rollback
+        self.skipUploaded = skipUploaded
+        self.deleteSkipped = deleteSkipped
+        self.hashCache = hashCache.hashCache(hashCacheFile)
+        self.moveJournal = moveJournal.moveJournal(moveJournalFile)
+        self.monitor = syncMonitor.syncMonitor(r_wSpeedCutOff,idleWindow_s)
         self.names = ['inputFile','outputDir']
-        self.df = pandas.read_excel(self.excelName,sheet_name=self.sheetName,names=self.names)
+        self.manifest = manifest
+        if (self.manifest is None):
+            self.df = pandas.read_excel(self.excelName,sheet_name=self.sheetName,names=self.names)
+            self.index = scanIndex.scanIndex(indexFile) if indexFile else None
+        elif (self.manifest.hasVirtualSplits()):
+            raise ValueError('Virtual splits can only be uploaded with dropboxAPI')
         self.dbx = dropbox.Dropbox(self.accessToken)
         
         print ('Stage 2 - Data upload using APP')
         logFile = open('./logs/upload/dropboxApp.log','w')
         logFile.write('%s\tData upload using APP\n' %(utils.timestamp()))
         logFile.close()
+        self.recoverMoves()
         self.getFileList()
+        if (self.skipUploaded):
+            self.removeUploaded()
         utils.mkdirs(self.dropboxDirList)
         self.makeBatches()
         self.uploadFiles()
@@ -153,7 +249,8 @@ class dropboxApp:
         uploaded to Dropbox. In addition to this the corresponding
         file size, file on local Dropbox, file on Dropbox website, and
         the new directories on local Dropbox that need to be made are
-        created.
+        created. If a manifest was given, the lists are taken from it
+        instead.
         
         Usage:
         -----
@@ -175,8 +272,21 @@ class dropboxApp:
             List of corresponding files with cloud Dropbox path.
         self.dropboxDirList : array of str
             List of local Dropbox directories that need to be created.
+        self.rootDirList : list of str
+            Destination of every row of the excel sheet on Dropbox
+            cloud. These folders are listed to check the uploads.
         """
         
+        if (self.manifest is not None):
+            self.fileNameList = numpy.asarray(self.manifest.fileNameList)
+            self.fileSizeList = numpy.asarray(self.manifest.fileSizeList)
+            self.dropboxFileList = numpy.asarray(self.manifest.dropboxFileList)
+            self.dropboxWebFileList = numpy.asarray([utils.getDropboxWebFileName(dropboxFile,self.dropboxDir) for dropboxFile in self.manifest.dropboxFileList])
+            self.dropboxDirList = numpy.unique(self.manifest.dropboxDirList)
+            self.rootDirList = [utils.getDropboxWebFileName(outputDir,self.dropboxDir) for outputDir in self.manifest.rootDirList]
+            return
+        
+        self.rootDirList = [utils.getDropboxWebFileName(outputDir,self.dropboxDir) for outputDir in self.df['outputDir']]
         fileNameList,fileSizeList,dropboxFileList,dropboxWebFileList,dropboxDirList = [],[],[],[],[]
         for inputFile,outputDir in self.df.values:
             if (os.path.isfile(inputFile)):
@@ -225,27 +335,49 @@ class dropboxApp:
             List of local Dropbox directories that need to be created.
         """
         
-        fileNameList,fileSizeList,dropboxFileList,dropboxWebFileList,dropboxDirList = [],[],[],[],[]
-        for root,dirs,files in os.walk(inputDir):
-            for name in files:
-                if (name not in exclusionList):
-                    fileName = os.path.join(root,name)
-                    fileSize = os.path.getsize(fileName)
-                    dropboxFile = fileName.replace(inputDir,outputDir)
-                    dropboxWebFile = utils.getDropboxWebFileName(dropboxFile,self.dropboxDir)
-                    dropboxDir = utils.getDirName(dropboxFile,name)
-                    fileNameList.append(fileName)
-                    fileSizeList.append(fileSize)
-                    dropboxFileList.append(dropboxFile)
-                    dropboxWebFileList.append(dropboxWebFile)
-                    dropboxDirList.append(dropboxDir)
+        fileNameList,fileSizeList,dropboxFileList,dropboxDirList = scanDir.getFilesInDir(inputDir,outputDir,exclusionList,index=self.index)
+        dropboxWebFileList = [utils.getDropboxWebFileName(dropboxFile,self.dropboxDir) for dropboxFile in dropboxFileList]
         return fileNameList,fileSizeList,dropboxFileList,dropboxWebFileList,dropboxDirList
     ############################################################
     
+    ############################################################
+    def removeUploaded(self):
+        """ Removes the files that are already on Dropbox from the upload
+        lists, see dropboxList.findUploaded(). Their source files are
+        deleted if self.deleteSkipped is True.
+        
+        Usage:
+        -----
+        self.removeUploaded()
+        
+        Returns:
+        -------
+        NULL
+        """
+        
+        try:
+            uploadedFlag = numpy.asarray(dropboxList.findUploaded(self.dbx,self.fileNameList,self.fileSizeList,self.dropboxWebFileList,self.hashCache,rootDirList=self.rootDirList),dtype=bool)
+        except Exception as e:
+            print ('%s Could not list Dropbox folders, no file skipped - %s' %(utils.timestamp(),e))
+            return
+        logFile = open('./logs/upload/dropboxApp.log','a')
+        for fileName,dropboxWebFile in zip(self.fileNameList[uploadedFlag],self.dropboxWebFileList[uploadedFlag]):
+            logFile.write('%s\t%s\t%s\tAlready on Dropbox, skipped\n' %(utils.timestamp(),fileName,dropboxWebFile))
+        logFile.close()
+        print ('%s %d files already on Dropbox, skipped' %(utils.timestamp(),numpy.sum(uploadedFlag)))
+        if (self.deleteSkipped):
+            utils.deleteFiles(self.fileNameList[uploadedFlag])
+        self.fileNameList = self.fileNameList[~uploadedFlag]
+        self.fileSizeList = self.fileSizeList[~uploadedFlag]
+        self.dropboxFileList = self.dropboxFileList[~uploadedFlag]
+        self.dropboxWebFileList = self.dropboxWebFileList[~uploadedFlag]
+    ############################################################
+    
     ############################################################
     def makeBatches(self):
         """ Splits the files to upload into smaller batches of size
-        self.batchSize.
+        self.batchSize with batchPlanner, using self.batchStrategy. The
+        size and fill of every batch are written to the log file.
         
         Usage:
         -----
@@ -270,37 +402,21 @@ class dropboxApp:
             Total number of batches to be uploaded.
         """
         
-        fileNameBatch,fileSizeBatch,dropboxFileBatch,dropboxWebFileBatch = [],[],[],[]
-        l1,l2,l3,l4,totalSize = [],[],[],[],0
-        lastFileIncluded = False
-        for fileName,fileSize,dropboxFile,dropboxWebFile in zip(self.fileNameList,self.fileSizeList,self.dropboxFileList,self.dropboxWebFileList):
-            totalSize += fileSize
-            if (totalSize <= self.batchSize):
-                l1.append(fileName)
-                l2.append(fileSize)
-                l3.append(dropboxFile)
-                l4.append(dropboxWebFile)
-            elif (totalSize > self.batchSize):
-                fileNameBatch.append(l1)
-                fileSizeBatch.append(l2)
-                dropboxFileBatch.append(l3)
-                dropboxWebFileBatch.append(l4)
-                l1,l2,l3,l4,totalSize = [],[],[],[],0
-                l1.append(fileName)
-                l2.append(fileSize)
-                l3.append(dropboxFile)
-                l4.append(dropboxWebFile)
-                totalSize += fileSize
-            if (fileName == self.fileNameList[-1]):
-                fileNameBatch.append(l1)
-                fileSizeBatch.append(l2)
-                dropboxFileBatch.append(l3)
-                dropboxWebFileBatch.append(l4)
-        self.fileNameBatch = fileNameBatch
-        self.fileSizeBatch = fileSizeBatch
-        self.dropboxFileBatch = dropboxFileBatch
-        self.dropboxWebFileBatch = dropboxWebFileBatch
-        self.numBatches = len(fileNameBatch)
+        batchList = batchPlanner.makeBatches(self.fileSizeList,self.batchSize,self.batchStrategy,self.dropboxFileList)
+        self.fileNameBatch = [self.fileNameList[batch] for batch in batchList]
+        self.fileSizeBatch = [self.fileSizeList[batch] for batch in batchList]
+        self.dropboxFileBatch = [self.dropboxFileList[batch] for batch in batchList]
+        self.dropboxWebFileBatch = [self.dropboxWebFileList[batch] for batch in batchList]
+        self.numBatches = len(batchList)
+        
+        batchSizeList,fillList = batchPlanner.batchFill(self.fileSizeList,batchList,self.batchSize)
+        logFile = open('./logs/upload/dropboxApp.log','a')
+        logFile.write('%s\t%d batches with %s strategy\n' %(utils.timestamp(),self.numBatches,self.batchStrategy))
+        for i,(batch,batchSize,fill) in enumerate(zip(batchList,batchSizeList,fillList)):
+            logFile.write('%s\tBatch %d - %d files, %.2f GB, %.1f%% full\n' %(utils.timestamp(),i+1,len(batch),batchSize/1024/1024/1024,fill))
+        logFile.close()
+        if (self.numBatches>0):
+            print ('%s %d batches, %.1f%% full on average' %(utils.timestamp(),self.numBatches,fillList.mean()))
     ############################################################
     
     ############################################################
@@ -310,7 +426,29 @@ class dropboxApp:
         available it a second verification is done if the files from
         current batch have uploaded successfully using
         self.checkFilesOnWebsite(). Only then, the next batch is
-        submitted for upload.
+        submitted for upload. The Dropbox content_hash of every file
+        is computed while it is copied, and a source file is only
+        deleted after the file on Dropbox has the same content_hash.
+        Files that were moved instead of copied (self.moveMode) are not
+        deleted, and if they are not verified they are moved back when
+        self.rollback is True. They are kept in self.moveJournal until
+        they are verified or moved back, see self.recoverMoves(). If the batch time limit is reached, the
+        batch is checked once more after the user confirms, so only
+        the files still missing from Dropbox are moved back, and none
+        are moved back if the folders could not be listed.
+        While a batch syncs the next batch is copied on a background
+        thread with self.stageBatch() if self.canStage() allows it, so
+        the Dropbox application has work queued as soon as the current
+        batch is done. After a batch is copied the program waits until
+        the Dropbox application is idle (self.monitor), for at most
+        self.sleepTime_min, before the first check. This wait is
+        skipped while the next batch is being copied, as Dropbox is
+        then busy with it as well. Between two checks
+        it waits for a change in the destination folders with
+        files/list_folder/longpoll for self.pollTime_s, doubled after
+        every check that finds no new file, up to self.sleepTime_min.
+        If the longpoll fails, it sleeps for the same time instead and
+        the next check lists the destination folders again.
         
         Usage:
         -----
@@ -321,40 +459,186 @@ class dropboxApp:
         NULL
         """
         
+        self.moveFlagBatch = []
+        for fileNameBatch in self.fileNameBatch:
+            if (self.moveMode):
+                self.moveFlagBatch.append(numpy.asarray(copyEngine.sameDevice(fileNameBatch,self.dropboxDir),dtype=bool))
+            else:
+                self.moveFlagBatch.append(numpy.zeros(len(fileNameBatch),dtype=bool))
+        executor = ThreadPoolExecutor(max_workers=1)
+        stageFuture = None
         for i in range(self.numBatches):
-            if (self.storageFree()==True):
-                print ('Uploading batch %d/%d' %(i+1,self.numBatches))
-                logFile = open('./logs/upload/dropboxApp.log','a')
-                logFile.write('%s\tUploading batch %d/%d\n' %(utils.timestamp(),i+1,self.numBatches))
-                logFile.close()
-                tic = time.time()
-                for fileName,fileSize,dropboxFile in zip(self.fileNameBatch[i],self.fileSizeBatch[i],self.dropboxFileBatch[i]):
-                    print ('%s\tMoving %s\tto\t%s' %(utils.timestamp(),fileName,dropboxFile))
+            if (stageFuture is not None):
+                self.localHashDict = stageFuture.result()
+            elif (self.storageFree()==True):
+                self.localHashDict = self.stageBatch(i)
+            else:
+                continue
+            stageFuture = None
+            if (i+1<self.numBatches and self.canStage(i,i+1)):
+                stageFuture = executor.submit(self.stageBatch,i+1)
+            tic = time.time()
+            uploadStatus = False
+            self.filesRemaining = list(self.dropboxWebFileBatch[i])
+            self.localSizeDict = dict(zip(self.dropboxWebFileBatch[i],self.fileSizeBatch[i]))
+            self.cursorList = None
+            if (stageFuture is None and self.monitor.waitForIdle(self.sleepTime_min*60)):
+                print ('%s Dropbox is idle, checking batch %d/%d' %(utils.timestamp(),i+1,self.numBatches))
+            pollTime = self.pollTime_s
+            while (uploadStatus==False):
+                numRemaining = len(self.filesRemaining)
+                uploadStatus = self.checkFilesOnWebsite()
+                if (uploadStatus==False):
+                    if (len(self.filesRemaining)<numRemaining):
+                        pollTime = self.pollTime_s
+                    try:
+                        dropboxList.waitForChanges(self.dbx,self.cursorList,pollTime)
+                    except (dropbox.exceptions.DropboxException,requests.exceptions.RequestException) as e:
+                        print ('%s Could not wait for changes on Dropbox - %s' %(utils.timestamp(),e))
+                        self.cursorList = None
+                        time.sleep(pollTime)
+                    pollTime = min(2*pollTime,self.sleepTime_min*60)
+                toc = time.time()
+                timeElapsed = (toc-tic)/60/60
+                if (timeElapsed > self.batchTimeLimit_hour):
                     logFile = open('./logs/upload/dropboxApp.log','a')
-                    logFile.write('%s\t%s\t%s\t%.6f GB\n' %(utils.timestamp(),fileName,dropboxFile,fileSize/1024/1024/1024))
+                    logFile.write('%s\tCurrent batch upload incomplete\n' %(utils.timestamp()))
                     logFile.close()
-                    shutil.copy(fileName,dropboxFile)
-                uploadStatus = False
-                self.filesRemaining = self.dropboxWebFileBatch[i]
-                while (uploadStatus==False):
-                    time.sleep(self.sleepTime_min*60)
-                    uploadStatus = self.checkFilesOnWebsite()
-                    toc = time.time()
-                    timeElapsed = (toc-tic)/60/60
-                    if (timeElapsed > self.batchTimeLimit_hour):
-                        logFile = open('./logs/upload/dropboxApp.log','a')
-                        logFile.write('%s\tCurrent batch upload incomplete\n' %(utils.timestamp()))
-                        logFile.close()
-                        input('Batch not uploaded! Make sure to finish batch sync and press enter to continue ...')
-                        uploadStatus = True
-                if (uploadStatus==True):
-                    utils.deleteFiles(self.fileNameBatch[i])
-    ############################################################
-    
-    ############################################################
-    def storageFree(self):
+                    input('Batch not uploaded! Make sure to finish batch sync and press enter to continue ...')
+                    self.checkFilesOnWebsite()
+                    uploadStatus = True
+            if (uploadStatus==True):
+                remainingSet = set(self.filesRemaining)
+                verifiedFileList,movedFileList = [],[]
+                logFile = open('./logs/upload/dropboxApp.log','a')
+                for fileName,dropboxFile,dropboxWebFile,moveFlag in zip(self.fileNameBatch[i],self.dropboxFileBatch[i],self.dropboxWebFileBatch[i],self.moveFlagBatch[i]):
+                    if (dropboxWebFile not in remainingSet):
+                        if not(moveFlag):
+                            verifiedFileList.append(fileName)
+                        else:
+                            movedFileList.append(fileName)
+                    elif not(moveFlag):
+                        logFile.write('%s\t%s\tNot verified on Dropbox, source file kept\n' %(utils.timestamp(),fileName))
+                    elif (self.rollback and self.cursorList is not None):
+                        try:
+                            os.replace(dropboxFile,fileName)
+                            movedFileList.append(fileName)
+                            logFile.write('%s\t%s\tNot verified on Dropbox, moved back\n' %(utils.timestamp(),fileName))
+                        except OSError as e:
+                            logFile.write('%s\t%s\tNot verified on Dropbox, could not be moved back from %s - %s\n' %(utils.timestamp(),fileName,dropboxFile,e))
+                    else:
+                        if not(self.rollback):
+                            movedFileList.append(fileName)
+                        logFile.write('%s\t%s\tNot verified on Dropbox, left in %s\n' %(utils.timestamp(),fileName,dropboxFile))
+                logFile.close()
+                utils.deleteFiles(verifiedFileList)
+                self.moveJournal.remove(movedFileList)
+        executor.shutdown()
+    ############################################################
+    
+    ############################################################
+    def recoverMoves(self):
+        """ Handle the files left in self.moveJournal by a previous run
+        that stopped before they were verified. A file that is in the
+        local Dropbox directory and no longer at its source is moved
+        back if self.rollback is True, so it is found and uploaded
+        again by this run. Otherwise it is left in the Dropbox
+        directory. A file that can not be moved back is kept in the
+        journal for the next run.
+        
+        Usage:
+        -----
+        self.recoverMoves()
+        
+        Returns:
+        -------
+        NULL
+        """
+        
+        doneList = []
+        logFile = open('./logs/upload/dropboxApp.log','a')
+        for fileName,dropboxFile in self.moveJournal.items():
+            if (os.path.exists(fileName) or not(os.path.exists(dropboxFile))):
+                pass
+            elif (self.rollback):
+                try:
+                    os.replace(dropboxFile,fileName)
+                    logFile.write('%s\t%s\tMoved by an interrupted run, moved back\n' %(utils.timestamp(),fileName))
+                except OSError as e:
+                    logFile.write('%s\t%s\tMoved by an interrupted run, could not be moved back from %s - %s\n' %(utils.timestamp(),fileName,dropboxFile,e))
+                    continue
+            else:
+                logFile.write('%s\t%s\tMoved by an interrupted run, left in %s\n' %(utils.timestamp(),fileName,dropboxFile))
+            doneList.append(fileName)
+        logFile.close()
+        self.moveJournal.remove(doneList)
+    ############################################################
+    
+    ############################################################
+    def stageBatch(self,i):
+        """ Copy the files of batch i to the local Dropbox directory with
+        copyEngine.copyFiles() and compute their Dropbox content_hash if
+        self.verifyHash is True. The files marked in self.moveFlagBatch
+        are moved instead, and recorded in self.moveJournal before
+        they are moved. The copy speed is written to the log.
+        
+        Usage:
+        -----
+        localHashDict = self.stageBatch(i)
+        
+        Returns:
+        -------
+        localHashDict : dict
+            content_hash of every file, by its name on Dropbox cloud.
+            None for every file if self.verifyHash is False.
+        """
+        
+        print ('Uploading batch %d/%d' %(i+1,self.numBatches))
+        logFile = open('./logs/upload/dropboxApp.log','a')
+        logFile.write('%s\tUploading batch %d/%d\n' %(utils.timestamp(),i+1,self.numBatches))
+        logFile.close()
+        logFile = open('./logs/upload/dropboxApp.log','a')
+        for fileName,fileSize,dropboxFile in zip(self.fileNameBatch[i],self.fileSizeBatch[i],self.dropboxFileBatch[i]):
+            print ('%s\tMoving %s\tto\t%s' %(utils.timestamp(),fileName,dropboxFile))
+            logFile.write('%s\t%s\t%s\t%.6f GB\n' %(utils.timestamp(),fileName,dropboxFile,fileSize/1024/1024/1024))
+        logFile.close()
+        self.moveJournal.add(self.fileNameBatch[i][self.moveFlagBatch[i]],self.dropboxFileBatch[i][self.moveFlagBatch[i]])
+        hashList,duration = copyEngine.copyFiles(self.fileNameBatch[i],self.dropboxFileBatch[i],self.fileSizeBatch[i],self.numCopyWorkers,self.verifyHash,moveFlagList=self.moveFlagBatch[i])
+        batchSize = self.fileSizeBatch[i].sum()
+        print ('%s Batch %d/%d copied, %.1f MB/s' %(utils.timestamp(),i+1,self.numBatches,batchSize/1024/1024/max(duration,1e-6)))
+        logFile = open('./logs/upload/dropboxApp.log','a')
+        logFile.write('%s\tBatch %d/%d copied\t%.6f GB\t%.1f s\t%.1f MB/s\n' %(utils.timestamp(),i+1,self.numBatches,batchSize/1024/1024/1024,duration,batchSize/1024/1024/max(duration,1e-6)))
+        logFile.close()
+        return dict(zip(self.dropboxWebFileBatch[i],hashList))
+    ############################################################
+    
+    ############################################################
+    def canStage(self,i,j):
+        """ Check if batch j can be copied while batch i is still in the
+        local Dropbox directory. The copied files of both batches have
+        to fit in self.stagingBudget, as moved files do not use any
+        space, and self.storageFree() has to find space for another
+        batch, without asking the user.
+        
+        Usage:
+        -----
+        self.canStage(i,j)
+        
+        Returns:
+        -------
+        bool (True/False)
+        """
+        
+        stagedSize = self.fileSizeBatch[i][~self.moveFlagBatch[i]].sum()+self.fileSizeBatch[j][~self.moveFlagBatch[j]].sum()
+        return (stagedSize<=self.stagingBudget and self.storageFree(wait=False))
+    ############################################################
+    
+    ############################################################
+    def storageFree(self,wait=True):
         """ Checks availability of hard drive space. If there is space
         to proceed with the next batch returns True otherwise False.
+        If wait is True and the disk is full, the user is asked to make
+        space before False is returned.
         
         Usage:
         -----
@@ -369,7 +653,7 @@ class dropboxApp:
         availableSpace = psutil.disk_usage(self.dropboxDir).free
         if (availableSpace >= 2*self.batchSize):
             free = True
-        else:
+        elif (wait):
             logFile = open('./logs/upload/dropboxApp.log','a')
             logFile.write('%s\tDisk full\n' %(utils.timestamp()))
             logFile.close()
@@ -386,10 +670,14 @@ class dropboxApp:
     ############################################################
     def checkFilesOnWebsite(self):
         """ Checks if all the files in current batch have been properly
-        uploaded to cloud. If not, then the program pauses and waits for
-        user to make sure Dropbox is running smoothly and batch sync is
-        complete. The functions accepts one argument - list of files on
-        Dropbox cloud that need to be checked.
+        uploaded to cloud. The first call lists the destination folders
+        of the batch recursively, and the following calls only read the
+        changes since the previous call using the list_folder cursors,
+        so the whole batch is matched with a few API calls. A file only
+        counts as uploaded if its content_hash on Dropbox is the same as
+        the one computed when it was copied, or only its size if
+        self.verifyHash is False. The uploaded files are
+        removed from self.filesRemaining.
         
         Usage:
         -----
@@ -397,23 +685,29 @@ class dropboxApp:
         
         Returns:
         -------
-        NULL
+        filesUploadFlag : bool
+            True if all the files of the batch are on Dropbox.
         """
         
-        filesUploadFlag = True
-        uploadedFileList = []
+        pathSet = set(fileName.lower() for fileName in self.filesRemaining)
+        try:
+            if (self.cursorList is None):
+                self.remoteDict,self.cursorList = dropboxList.listFolders(self.dbx,dropboxList.getTopFolders(self.filesRemaining,self.rootDirList),pathSet)
+            else:
+                self.cursorList = [dropboxList.continueFolder(self.dbx,cursor,self.remoteDict,pathSet) for cursor in self.cursorList]
+        except Exception as e:
+            print ('%s Could not list Dropbox folders - %s' %(utils.timestamp(),e))
+            self.cursorList = None
+            return False
+        remainingList = []
         for fileName in self.filesRemaining:
-            try:
-                tt = self.dbx.files_get_metadata(fileName)
-                print ('%s Upload successful - %s' %(utils.timestamp(),fileName))
-                uploadedFileList.append(fileName)
-            except:
-                filesUploadFlag = False
-                print ('%s Upload ongoing - %s' %(utils.timestamp(),fileName))
-                break
-        for fileName in uploadedFileList:
-            self.filesRemaining.remove(fileName)
-        return filesUploadFlag
+            metadata = self.remoteDict.get(fileName.lower())
+            localHash = self.localHashDict[fileName]
+            if (metadata is None or (localHash is not None and metadata.content_hash!=localHash) or (localHash is None and metadata.size!=self.localSizeDict[fileName])):
+                remainingList.append(fileName)
+        print ('%s Upload successful - %d files, upload ongoing - %d files' %(utils.timestamp(),len(self.filesRemaining)-len(remainingList),len(remainingList)))
+        self.filesRemaining = remainingList
+        return len(self.filesRemaining)==0
     ############################################################
 ############################################################
 
@@ -435,13 +729,48 @@ class dropboxAPI:
     chunkSize_MB : float
         A large file will be uploaded in smaller pieces of a size
         defined by this.
+    indexFile : str
+        SQLite file where directory scans are kept so that a rerun only
+        lists the directories that changed. Default is None (no index).
+    manifest : manifest.uploadManifest
+        list of files prepared by dataPrep. If given, the excel sheet is
+        not read and the files are not scanned again. Default is None.
+    numWorkers : int
+        number of files uploaded at the same time. Files that fit in a
+        single chunk are uploaded concurrently in upload sessions and
+        committed together with one batch call. If 1, every file is
+        uploaded one at a time. Default is 8.
+    journalFile : str
+        json file where the upload sessions of large files are recorded
+        so that a failed or interrupted upload continues from the last
+        acknowledged chunk. If None, sessions are only resumed within
+        the same run. Default is None.
+    skipUploaded : bool
+        If True, files that are already on Dropbox with the same size
+        and content_hash are not uploaded again. Default is False.
+    deleteSkipped : bool
+        If True, the source of a file that is skipped because it is
+        already on Dropbox is deleted. Default is False.
+    hashCacheFile : str
+        SQLite file where the content_hash of local files is kept so
+        that unchanged files are not read again. Default is None (no
+        cache between runs).
         
     Methods:
     -------
     getFileList()
     getFilesInDir(inputDir,outputDir)
+    removeUploaded()
     mkdirs()
     uploadFiles()
+    uploadFile(fileName,fileSize,dropboxFile)
+    uploadSession(fileName,fileSize,dropboxFile)
+    sourceChanged(fileName,stat)
+    handleSessionError(error,dropboxFile)
+    verifyContentHash(metadata,localHash)
+    uploadBatch(fileNameList,fileSizeList,dropboxFileList)
+    startSession(fileName,dropboxFile)
+    finishBatch(entryList)
     dropboxStorageFree()
     
     Attributes:
@@ -485,7 +814,7 @@ class dropboxAPI:
     """
     
     ############################################################
-    def __init__(self,excelName,sheetName,accessToken,chunkSize_MB):
+    def __init__(self,excelName,sheetName,accessToken,chunkSize_MB,indexFile=None,manifest=None,numWorkers=8,journalFile=None,skipUploaded=False,deleteSkipped=False,hashCacheFile=None):
         """ Creates attribute variables and makes a log file
         dropboxAPI.log in the logs directory.
         
@@ -497,16 +826,28 @@ class dropboxAPI:
         self.names = ['inputFile','outputDir']
         self.accessToken = accessToken
         self.chunkSize = chunkSize_MB*1024*1024
-        self.df = pandas.read_excel(self.excelName,sheet_name=self.sheetName,names=self.names)
+        self.numWorkers = numWorkers
+        self.batchLimit = 1000
+        self.threadLocal = threading.local()
+        self.journal = uploadJournal.uploadJournal(journalFile)
+        self.skipUploaded = skipUploaded
+        self.deleteSkipped = deleteSkipped
+        self.hashCache = hashCache.hashCache(hashCacheFile)
+        self.manifest = manifest
+        if (self.manifest is None):
+            self.df = pandas.read_excel(self.excelName,sheet_name=self.sheetName,names=self.names)
+            self.index = scanIndex.scanIndex(indexFile) if indexFile else None
         
         print ('Stage 2 - Data upload using API')
-        logFile = open('logs/dropboxAPI.log','w')
-        logFile.write('%s\tStage 2 - Data upload using API\n' %(utils.timestamp()))
+        self.logFile = open('logs/dropboxAPI.log','w')
+        self.logFile.write('%s\tStage 2 - Data upload using API\n' %(utils.timestamp()))
         self.dbx = dropbox.Dropbox(accessToken)
         self.getFileList()
+        if (self.skipUploaded):
+            self.removeUploaded()
         self.mkdirs()
         self.uploadFiles()
-        logFile.close()
+        self.logFile.close()
     ############################################################
     
     ############################################################
@@ -514,7 +855,8 @@ class dropboxAPI:
         """ Use self.df to generate the list of files that need to be
         uploaded to Dropbox. In addition to this the corresponding
         file size, file on Dropbox cloud, and the new directories on
-        cloud Dropbox that need to be made are created.
+        cloud Dropbox that need to be made are created. If a manifest
+        was given, the lists are taken from it instead.
         
         Usage:
         -----
@@ -534,8 +876,29 @@ class dropboxAPI:
             List of corresponding files with cloud Dropbox path.
         self.dropboxDirList : array of str
             List of cloud Dropbox directories that need to be created.
+        self.offsetList : array of int or None
+            Position of the part to upload in every file, or None if
+            the whole file is uploaded (see manifest.uploadManifest).
+        self.partsRemaining : collections.Counter
+            Number of parts of every virtually split file that are not
+            uploaded yet.
+        self.rootDirList : list of str
+            Destination of every row of the excel sheet on Dropbox
+            cloud. These folders are listed to find files that are
+            already uploaded.
         """
         
+        if (self.manifest is not None):
+            self.fileNameList = numpy.asarray(self.manifest.fileNameList)
+            self.fileSizeList = numpy.asarray(self.manifest.fileSizeList)
+            self.dropboxFileList = numpy.asarray(self.manifest.dropboxFileList)
+            self.dropboxDirList = numpy.unique(self.manifest.dropboxDirList)
+            self.offsetList = numpy.asarray(self.manifest.offsetList,dtype=object)
+            self.partsRemaining = collections.Counter(fileName for fileName,offset in zip(self.manifest.fileNameList,self.manifest.offsetList) if offset is not None)
+            self.rootDirList = list(self.manifest.rootDirList)
+            return
+        
+        self.rootDirList = list(self.df['outputDir'])
         fileNameList,fileSizeList,dropboxFileList,dropboxDirList = [],[],[],[]
         for inputFile,outputDir in self.df.values:
             if (os.path.isfile(inputFile)):
@@ -556,6 +919,8 @@ class dropboxAPI:
         self.fileSizeList = numpy.asarray(fileSizeList)
         self.dropboxFileList = numpy.asarray(dropboxFileList)
         self.dropboxDirList = numpy.unique(dropboxDirList)
+        self.offsetList = numpy.asarray([None]*len(fileNameList),dtype=object)
+        self.partsRemaining = collections.Counter()
     ############################################################
     
     ############################################################
@@ -579,21 +944,45 @@ class dropboxAPI:
             List of cloud Dropbox directories that need to be created.
         """
         
-        fileNameList,fileSizeList,dropboxFileList,dropboxDirList = [],[],[],[]
-        for root,dirs,files in os.walk(inputDir):
-            for name in files:
-                if (name not in exclusionList):
-                    fileName = os.path.join(root,name)
-                    fileSize = os.path.getsize(fileName)
-                    dropboxFile = fileName.replace(inputDir,outputDir)
-                    dropboxDir = utils.getDirName(dropboxFile,name)
-                    fileNameList.append(fileName)
-                    fileSizeList.append(fileSize)
-                    dropboxFileList.append(dropboxFile)
-                    dropboxDirList.append(dropboxDir)
+        fileNameList,fileSizeList,dropboxFileList,dropboxDirList = scanDir.getFilesInDir(inputDir,outputDir,exclusionList,index=self.index)
         return fileNameList,fileSizeList,dropboxFileList,dropboxDirList
     ############################################################
     
+    ############################################################
+    def removeUploaded(self):
+        """ Removes the files, and the parts of virtually split files,
+        that are already on Dropbox from the upload lists, see
+        dropboxList.findUploaded(). A skipped part always counts as
+        uploaded in self.partsRemaining, so a virtually split file is
+        deleted once its remaining parts are uploaded. If
+        self.deleteSkipped is True the skipped files, and the virtually
+        split files whose parts were all skipped, are deleted with
+        self.removeFile().
+        
+        Usage:
+        -----
+        self.removeUploaded()
+        
+        Returns:
+        -------
+        NULL
+        """
+        
+        try:
+            uploadedFlag = numpy.asarray(dropboxList.findUploaded(self.dbx,self.fileNameList,self.fileSizeList,self.dropboxFileList,self.hashCache,self.offsetList,self.rootDirList),dtype=bool)
+        except Exception as e:
+            print ('%s Could not list Dropbox folders, no file skipped - %s' %(utils.timestamp(),e))
+            return
+        for fileName,dropboxFile,offset in zip(self.fileNameList[uploadedFlag],self.dropboxFileList[uploadedFlag],self.offsetList[uploadedFlag]):
+            self.logFile.write('%s\t%s\t%s\tAlready on Dropbox, skipped\n' %(utils.timestamp(),fileName,dropboxFile))
+            self.removeFile(fileName,offset,self.deleteSkipped)
+        print ('%s %d files already on Dropbox, skipped' %(utils.timestamp(),numpy.sum(uploadedFlag)))
+        self.fileNameList = self.fileNameList[~uploadedFlag]
+        self.fileSizeList = self.fileSizeList[~uploadedFlag]
+        self.dropboxFileList = self.dropboxFileList[~uploadedFlag]
+        self.offsetList = self.offsetList[~uploadedFlag]
+    ############################################################
+    
     ############################################################
     def mkdirs(self):
         """ Creates a list of directories on Dropbox cloud.
@@ -616,10 +1005,11 @@ class dropboxAPI:
     
     ############################################################
     def uploadFiles(self):
-        """ Uploads files to cloud using Dropbox API. If the upload
-        fails, it is attempted again for a maximum of three times
-        before moving on to the next file. A large file is read in
-        smaller chunks and uploaded.
+        """ Uploads files to cloud using Dropbox API. If self.numWorkers
+        is more than 1, the files that fit in a single chunk are sent
+        concurrently with self.uploadBatch(). The rest of the files, and
+        the parts of virtually split files, are uploaded one at a time
+        with self.uploadFile().
         
         Usage:
         -----
@@ -630,39 +1020,368 @@ class dropboxAPI:
         NULL
         """
         
-        for fileName,fileSize,dropboxFile in zip(self.fileNameList,self.fileSizeList,self.dropboxFileList):
-            if not(self.dropboxStorageFree(fileSize)):
-                input('Dropbox cloud full. Make sure you have enough space and press enter.')
-                
-            print ('Uploading %s\tto\t%s' %(fileName,dropboxFile))
-            numChunks = int(numpy.ceil(fileSize/self.chunkSize))
-            attemptCounter,success = 1,False
-            while (attemptCounter<=3 and success==False):
-                try:
-                    f = open(fileName,'rb')
-                    if (numChunks==1):
-                        self.dbx.files_upload(f.read(),dropboxFile)
+        wholeFlag = numpy.asarray([offset is None for offset in self.offsetList],dtype=bool)
+        if (self.numWorkers>1):
+            smallFlag = (self.fileSizeList<=self.chunkSize) & wholeFlag
+        else:
+            smallFlag = numpy.zeros(len(self.fileNameList),dtype=bool)
+        for i in range(0,int(numpy.sum(smallFlag)),self.batchLimit):
+            self.uploadBatch(self.fileNameList[smallFlag][i:i+self.batchLimit],self.fileSizeList[smallFlag][i:i+self.batchLimit],self.dropboxFileList[smallFlag][i:i+self.batchLimit])
+        for fileName,fileSize,dropboxFile,offset in zip(self.fileNameList[~smallFlag],self.fileSizeList[~smallFlag],self.dropboxFileList[~smallFlag],self.offsetList[~smallFlag]):
+            self.uploadFile(fileName,fileSize,dropboxFile,offset)
+    ############################################################
+    
+    ############################################################
+    def uploadFile(self,fileName,fileSize,dropboxFile,offset=None):
+        """ Uploads one file to cloud using Dropbox API. If the upload
+        fails, it is attempted again for a maximum of three times
+        before moving on to the next file. A large file is uploaded in
+        chunks with self.uploadSession(), and a new attempt continues
+        from the last chunk acknowledged by Dropbox. The Dropbox
+        content_hash is computed from the bytes that are sent and the
+        local file is only deleted if it matches the content_hash of
+        the uploaded file. A new attempt only replaces a file that was
+        committed by this upload with a wrong content_hash, using
+        WriteMode.update with its rev. Any other failure is attempted
+        again with WriteMode.add, so an unrelated file already on
+        Dropbox is never overwritten. If offset is given, only
+        fileSize bytes of fileName starting at offset are uploaded, and
+        fileName is deleted with self.removeFile() once all its parts
+        are uploaded. Otherwise the whole file is uploaded with its
+        size at the time of the upload, whatever fileSize is, and it is
+        kept if its size or modification time changed during the
+        upload, see self.sourceChanged().
+        
+        Usage:
+        -----
+        self.uploadFile(fileName,fileSize,dropboxFile,offset)
+        
+        Returns:
+        -------
+        NULL
+        """
+        
+        if not(self.dropboxStorageFree(fileSize)):
+            input('Dropbox cloud full. Make sure you have enough space and press enter.')
+            
+        print ('Uploading %s\tto\t%s' %(fileName,dropboxFile))
+        if (offset is None):
+            stat = os.stat(fileName)
+            fileSize = stat.st_size
+        numChunks = int(numpy.ceil(fileSize/self.chunkSize))
+        attemptCounter,success = 1,False
+        mode = dropbox.files.WriteMode.add
+        while (attemptCounter<=3 and success==False):
+            try:
+                if (numChunks<=1):
+                    with open(fileName,'rb') as f:
+                        f.seek(offset or 0)
+                        data = f.read(fileSize)
+                    hasher = contentHash.contentHasher()
+                    hasher.update(data)
+                    metadata = self.dbx.files_upload(data,dropboxFile,mode=mode)
+                    self.verifyContentHash(metadata,hasher.hexdigest())
+                else:
+                    self.uploadSession(fileName,fileSize,dropboxFile,mode,offset)
+                if (offset is None and self.sourceChanged(fileName,stat)):
+                    self.logFile.write('%s\t%s\tChanged during upload, source file kept\n' %(utils.timestamp(),fileName))
+                else:
+                    self.removeFile(fileName,offset)
+                self.logFile.write('%s\t%s\t%s\t%.6f GB\tSuccess\n' %(utils.timestamp(),fileName,dropboxFile,fileSize/1024/1024/1024))
+                success=True
+            except Exception as e:
+                self.handleSessionError(e,dropboxFile)
+                if isinstance(e,contentHashError):
+                    mode = dropbox.files.WriteMode.update(e.metadata.rev)
+                self.logFile.write('%s\t%s\t%s\t%.6f GB\tFailed\n' %(utils.timestamp(),fileName,dropboxFile,fileSize/1024/1024/1024))
+                print ("Error uploading %s. Trying again." %(fileName))
+                attemptCounter += 1
+    ############################################################
+    
+    ############################################################
+    def uploadSession(self,fileName,fileSize,dropboxFile,mode=dropbox.files.WriteMode.add,start=None):
+        """ Uploads a large file in chunks of self.chunkSize using an
+        upload session. The next chunk is read from disk by chunkReader
+        while the current chunk is being uploaded. After every chunk the
+        session id and the acknowledged offset are written to
+        self.journal, and if the journal already has a session for this
+        file the upload continues from its offset. The content_hash of
+        the chunks is checked against the committed file. If start is
+        given, the fileSize bytes of fileName from start are uploaded.
+        
+        Usage:
+        -----
+        self.uploadSession(fileName,fileSize,dropboxFile,mode,start)
+        
+        Returns:
+        -------
+        NULL
+        """
+        
+        start = start or 0
+        session = self.journal.get(fileName,dropboxFile)
+        sessionId,offset,hashState = session if (session is not None) else (None,0,None)
+        if (offset>0):
+            print ('Resuming upload of %s from %.6f GB' %(dropboxFile,offset/1024/1024/1024))
+            if (hashState is not None):
+                hasher = contentHash.contentHasher(hashState)
+            else:
+                hasher = contentHash.fileContentHash(fileName,length=offset,offset=start)
+        else:
+            hasher = contentHash.contentHasher()
+        commit = dropbox.files.CommitInfo(path=dropboxFile,mode=mode)
+        finished = False
+        with chunkReader.chunkReader(fileName,self.chunkSize,offset=start+offset,length=fileSize-offset) as reader:
+            for offset,chunk in tqdm(reader,total=int(numpy.ceil((fileSize-offset)/self.chunkSize))):
+                offset -= start
+                if (sessionId is None):
+                    sessionId = self.dbx.files_upload_session_start(chunk).session_id
+                elif (offset+len(chunk)>=fileSize):
+                    cursor = dropbox.files.UploadSessionCursor(session_id=sessionId,offset=offset)
+                    metadata = self.dbx.files_upload_session_finish(chunk,cursor,commit)
+                    hasher.update(chunk)
+                    finished = True
+                    break
+                else:
+                    cursor = dropbox.files.UploadSessionCursor(session_id=sessionId,offset=offset)
+                    self.dbx.files_upload_session_append_v2(chunk,cursor)
+                hasher.update(chunk)
+                self.journal.update(fileName,dropboxFile,sessionId,offset+len(chunk),hasher.getState())
+        if not(finished):
+            cursor = dropbox.files.UploadSessionCursor(session_id=sessionId,offset=fileSize)
+            metadata = self.dbx.files_upload_session_finish(b'',cursor,commit)
+        self.journal.remove(dropboxFile)
+        self.verifyContentHash(metadata,hasher.hexdigest())
+    ############################################################
+    
+    ############################################################
+    def sourceChanged(self,fileName,stat):
+        """ Check if a local file was changed after stat was taken, by
+        comparing its size and modification time. A file that changed
+        while it was uploaded is not deleted, as Dropbox may only have
+        part of its new content.
+        
+        Usage:
+        -----
+        changed = self.sourceChanged(fileName,stat)
+        
+        Returns:
+        -------
+        changed : bool
+            True if the file was changed or removed.
+        """
+        
+        try:
+            newStat = os.stat(fileName)
+        except OSError:
+            return True
+        return newStat.st_size!=stat.st_size or newStat.st_mtime_ns!=stat.st_mtime_ns
+    ############################################################
+    
+    ############################################################
+    def removeFile(self,fileName,offset=None,deleteFlag=True):
+        """ Deletes a local file after it is uploaded. For a part of a
+        virtually split file (offset is not None), the part is counted
+        as uploaded and the file is only deleted after the last of its
+        parts is uploaded, so a failed part keeps the original file.
+        If deleteFlag is False the part is counted but no file is
+        deleted.
+        
+        Usage:
+        -----
+        self.removeFile(fileName,offset,deleteFlag)
+        
+        Returns:
+        -------
+        NULL
+        """
+        
+        if (offset is None):
+            if (deleteFlag):
+                os.remove(fileName)
+            return
+        self.partsRemaining[fileName] -= 1
+        if (self.partsRemaining[fileName]==0 and deleteFlag):
+            os.remove(fileName)
+            self.logFile.write('%s\t%s\tAll parts uploaded, file deleted\n' %(utils.timestamp(),fileName))
+    ############################################################
+    
+    ############################################################
+    def handleSessionError(self,error,dropboxFile):
+        """ Updates self.journal after a failed chunk. If Dropbox
+        reports a different offset for the session, the journal is
+        moved to that offset. If the session can not be found or used
+        any more, it is removed so that the next attempt starts a new
+        session.
+        
+        Usage:
+        -----
+        self.handleSessionError(error,dropboxFile)
+        
+        Returns:
+        -------
+        NULL
+        """
+        
+        lookupError = getattr(error,'error',None)
+        if (hasattr(lookupError,'is_lookup_failed') and lookupError.is_lookup_failed()):
+            lookupError = lookupError.get_lookup_failed()
+        if not(isinstance(lookupError,dropbox.files.UploadSessionLookupError)):
+            return
+        if (lookupError.is_incorrect_offset()):
+            session = self.journal.sessionDict.get(dropboxFile)
+            if (session is not None):
+                self.journal.update(session['fileId'][0],dropboxFile,session['sessionId'],lookupError.get_incorrect_offset().correct_offset)
+        else:
+            self.journal.remove(dropboxFile)
+    ############################################################
+    
+    ############################################################
+    def verifyContentHash(self,metadata,localHash):
+        """ Compares the content_hash of an uploaded file with the one
+        computed from the local bytes.
+        
+        Usage:
+        -----
+        self.verifyContentHash(metadata,localHash)
+        
+        Returns:
+        -------
+        NULL
+        
+        Raises:
+        ------
+        contentHashError if the two hashes are different.
+        """
+        
+        if (getattr(metadata,'content_hash',None)!=localHash):
+            raise contentHashError('content_hash mismatch for %s' %(getattr(metadata,'path_display',None)),metadata)
+    ############################################################
+    
+    ############################################################
+    def uploadBatch(self,fileNameList,fileSizeList,dropboxFileList):
+        """ Uploads a batch of small files concurrently. Every file is
+        sent in its own closed upload session by a pool of
+        self.numWorkers threads, and all the sessions are committed
+        together with self.finishBatch(). A local file is only deleted
+        if the content_hash of the committed file matches the bytes
+        that were sent and the file has not changed since it was read,
+        see self.sourceChanged(). Files that fail are attempted again for a
+        maximum of three times, with WriteMode.update and the rev of
+        the committed file if its content_hash was wrong, otherwise
+        with WriteMode.add.
+        
+        Usage:
+        -----
+        self.uploadBatch(fileNameList,fileSizeList,dropboxFileList)
+        
+        Returns:
+        -------
+        NULL
+        """
+        
+        if not(self.dropboxStorageFree(numpy.sum(fileSizeList))):
+            input('Dropbox cloud full. Make sure you have enough space and press enter.')
+            
+        print ('Uploading batch of %d files' %(len(fileNameList)))
+        remainingList = list(zip(fileNameList,fileSizeList,dropboxFileList))
+        modeDict = {}
+        attemptCounter = 1
+        while (attemptCounter<=3 and len(remainingList)>0):
+            with ThreadPoolExecutor(max_workers=self.numWorkers) as executor:
+                futureList = [executor.submit(self.startSession,fileName,dropboxFile,modeDict.get(dropboxFile,dropbox.files.WriteMode.add)) for fileName,fileSize,dropboxFile in remainingList]
+                entryList = []
+                for future in tqdm(futureList):
+                    try:
+                        entryList.append(future.result())
+                    except:
+                        entryList.append(None)
+            try:
+                resultList = self.finishBatch([entry[0] for entry in entryList if entry is not None])
+            except:
+                resultList = []
+            resultIter,failedList = iter(resultList),[]
+            for (fileName,fileSize,dropboxFile),entry in zip(remainingList,entryList):
+                result = next(resultIter,None) if (entry is not None) else None
+                if (result is not None and result.is_success() and result.get_success().content_hash==entry[1]):
+                    if (self.sourceChanged(fileName,entry[2])):
+                        self.logFile.write('%s\t%s\tChanged during upload, source file kept\n' %(utils.timestamp(),fileName))
                     else:
-                        for i in tqdm(range(numChunks)):
-                            chunk = f.read(self.chunkSize)
-                            if (i==0):
-                                upload_session_start_result = self.dbx.files_upload_session_start(chunk)
-                                cursor = dropbox.files.UploadSessionCursor(session_id=upload_session_start_result.session_id,offset=f.tell())
-                                commit = dropbox.files.CommitInfo(path=dropboxFile)
-                            elif (i==numChunks-1):
-                                self.dbx.files_upload_session_finish(chunk,cursor,commit)
-                            else:
-                                self.dbx.files_upload_session_append(chunk,cursor.session_id,cursor.offset)
-                                cursor.offset = f.tell()
-                    f.close()
-                    os.remove(fileName)
-                    logFile.write('%s\t%s\t%s\t%.6f GB\tSuccess\n' %(utils.timestamp(),fileName,dropboxFile,fileSize/1024/1024/1024))
-                    success=True
-                except:
-                    logFile.write('%s\t%s\t%s\t%.6f GB\tFailed\n' %(utils.timestamp(),fileName,dropboxFile,fileSize/1024/1024/1024))
+                        os.remove(fileName)
+                    self.logFile.write('%s\t%s\t%s\t%.6f GB\tSuccess\n' %(utils.timestamp(),fileName,dropboxFile,fileSize/1024/1024/1024))
+                else:
+                    if (result is not None and result.is_success()):
+                        modeDict[dropboxFile] = dropbox.files.WriteMode.update(result.get_success().rev)
+                    self.logFile.write('%s\t%s\t%s\t%.6f GB\tFailed\n' %(utils.timestamp(),fileName,dropboxFile,fileSize/1024/1024/1024))
                     print ("Error uploading %s. Trying again." %(fileName))
-                    attemptCounter += 1
-                    f.close()
+                    failedList.append((fileName,fileSize,dropboxFile))
+            remainingList = failedList
+            attemptCounter += 1
+    ############################################################
+    
+    ############################################################
+    def startSession(self,fileName,dropboxFile,mode=dropbox.files.WriteMode.add):
+        """ Uploads a whole file in a single closed upload session.
+        Called from the worker threads of self.uploadBatch(), each of
+        which uses its own Dropbox client.
+        
+        Usage:
+        -----
+        entry,localHash,stat = self.startSession(fileName,dropboxFile,mode)
+        
+        Returns:
+        -------
+        entry : dropbox.files.UploadSessionFinishArg
+            Session cursor and commit information for the file.
+        localHash : str
+            Dropbox content_hash of the bytes that were sent.
+        stat : os.stat_result
+            stat of the file taken before it was read.
+        """
+        
+        if not(hasattr(self.threadLocal,'dbx')):
+            self.threadLocal.dbx = dropbox.Dropbox(self.accessToken)
+        stat = os.stat(fileName)
+        with open(fileName,'rb') as f:
+            data = f.read()
+        hasher = contentHash.contentHasher()
+        hasher.update(data)
+        upload_session_start_result = self.threadLocal.dbx.files_upload_session_start(data,close=True)
+        cursor = dropbox.files.UploadSessionCursor(session_id=upload_session_start_result.session_id,offset=len(data))
+        commit = dropbox.files.CommitInfo(path=dropboxFile,mode=mode)
+        return dropbox.files.UploadSessionFinishArg(cursor=cursor,commit=commit),hasher.hexdigest(),stat
+    ############################################################
+    
+    ############################################################
+    def finishBatch(self,entryList):
+        """ Commits a list of closed upload sessions with a single
+        call. Uses files_upload_session_finish_batch_v2 if the Dropbox
+        package has it, otherwise launches the batch job and polls it
+        until it is complete.
+        
+        Usage:
+        -----
+        resultList = self.finishBatch(entryList)
+        
+        Returns:
+        -------
+        resultList : list of dropbox.files.UploadSessionFinishBatchResultEntry
+            Result for every entry in the same order as entryList.
+        """
+        
+        if (len(entryList)==0):
+            return []
+        if (hasattr(self.dbx,'files_upload_session_finish_batch_v2')):
+            return self.dbx.files_upload_session_finish_batch_v2(entryList).entries
+        launch = self.dbx.files_upload_session_finish_batch(entryList)
+        if (launch.is_complete()):
+            return launch.get_complete().entries
+        asyncJobId = launch.get_async_job_id()
+        while (True):
+            status = self.dbx.files_upload_session_finish_batch_check(asyncJobId)
+            if (status.is_complete()):
+                return status.get_complete().entries
+            time.sleep(1)
     ############################################################
     
     ############################################################
@@ -0,0 +1,278 @@
+import os
+import time
+import posixpath
+import dropbox
+
+############################################################
+def getTopFolders(dropboxWebFileList,rootDirList=None):
+    """ Get the smallest set of Dropbox folders that contains all the
+    given files. Every file is replaced by the folder of rootDirList
+    it is in, usually the destination of its row in the excel sheet,
+    or by its own folder if it is in none of them. A folder is left
+    out if one of its parent folders is already in the set.
+
+    Parameters:
+    ----------
+    dropboxWebFileList : list of str
+        files with full path on Dropbox cloud.
+    rootDirList : list of str
+        folders on Dropbox cloud to list instead of the folders below
+        them. Default is None.
+
+    Returns:
+    -------
+    folderList : list of str
+        folders on Dropbox cloud. The root folder is ''.
+
+    Usage:
+    -----
+    folderList = getTopFolders(dropboxWebFileList,rootDirList)
+    """
+
+    rootSet = set(root.rstrip('/').lower() for root in (rootDirList or []))
+    topDict = {}
+    for folder in set(posixpath.dirname(fileName) for fileName in dropboxWebFileList):
+        folder = folder.rstrip('/')
+        top,parent = folder,folder.lower()
+        while (parent!=''):
+            if (parent in rootSet):
+                top = folder[:len(parent)]
+                break
+            parent = posixpath.dirname(parent).rstrip('/')
+        topDict[top.lower()+'/'] = top
+    folderList,lastKey = [],None
+    for key in sorted(topDict):
+        if (lastKey is None or not(key.startswith(lastKey))):
+            folderList.append(topDict[key])
+            lastKey = key
+    return folderList
+############################################################
+
+############################################################
+def applyEntries(entryList,metadataDict,pathSet=None):
+    """ Apply the entries of a list_folder result to metadataDict.
+    Files are added or updated and deleted entries are removed.
+
+    Parameters:
+    ----------
+    entryList : list of dropbox.files.Metadata
+        entries returned by files_list_folder or
+        files_list_folder_continue.
+    metadataDict : dict
+        lower case path -> dropbox.files.FileMetadata.
+    pathSet : set of str
+        lower case paths to keep. If None, every file is kept.
+
+    Returns:
+    -------
+    NULL
+
+    Usage:
+    -----
+    applyEntries(result.entries,metadataDict,pathSet)
+    """
+
+    for entry in entryList:
+        path = entry.path_lower
+        if (pathSet is not None and path not in pathSet):
+            continue
+        if isinstance(entry,dropbox.files.FileMetadata):
+            metadataDict[path] = entry
+        elif isinstance(entry,dropbox.files.DeletedMetadata):
+            metadataDict.pop(path,None)
+############################################################
+
+############################################################
+def listFolder(dbx,folder,metadataDict,pathSet=None,fallback=True):
+    """ List a Dropbox folder recursively, following the cursor until
+    all the pages are read. If the folder does not exist yet, its
+    parent folder is listed instead, or nothing if fallback is False.
+
+    Parameters:
+    ----------
+    dbx : dropbox.Dropbox
+        Dropbox client.
+    folder : str
+        folder on Dropbox cloud. The root folder is ''.
+    metadataDict : dict
+        lower case path -> dropbox.files.FileMetadata, updated in place.
+    pathSet : set of str
+        lower case paths to keep. If None, every file is kept.
+    fallback : bool
+        list the parent folder if folder does not exist. Default is
+        True.
+
+    Returns:
+    -------
+    cursor : str
+        cursor after the last page, to be used with continueFolder()
+        and waitForChanges(). None if folder does not exist and
+        fallback is False.
+
+    Usage:
+    -----
+    cursor = listFolder(dbx,folder,metadataDict,pathSet,fallback)
+    """
+
+    while (True):
+        try:
+            result = dbx.files_list_folder(folder,recursive=True)
+            break
+        except dropbox.exceptions.ApiError as e:
+            if (folder=='' or not(e.error.is_path() and e.error.get_path().is_not_found())):
+                raise
+            if not(fallback):
+                return None
+            folder = posixpath.dirname(folder)
+            folder = '' if (folder=='/') else folder
+    applyEntries(result.entries,metadataDict,pathSet)
+    while (result.has_more):
+        result = dbx.files_list_folder_continue(result.cursor)
+        applyEntries(result.entries,metadataDict,pathSet)
+    return result.cursor
+############################################################
+
+############################################################
+def continueFolder(dbx,cursor,metadataDict,pathSet=None):
+    """ Read the changes made since cursor and apply them to
+    metadataDict.
+
+    Usage:
+    -----
+    cursor = continueFolder(dbx,cursor,metadataDict,pathSet)
+
+    Returns:
+    -------
+    cursor : str
+        cursor after the last change.
+    """
+
+    while (True):
+        result = dbx.files_list_folder_continue(cursor)
+        applyEntries(result.entries,metadataDict,pathSet)
+        cursor = result.cursor
+        if not(result.has_more):
+            return cursor
+############################################################
+
+############################################################
+def listFolders(dbx,folderList,pathSet=None,fallback=True):
+    """ List several Dropbox folders recursively. See listFolder()
+    for fallback.
+
+    Usage:
+    -----
+    metadataDict,cursorList = listFolders(dbx,folderList,pathSet,fallback)
+
+    Returns:
+    -------
+    metadataDict : dict
+        lower case path -> dropbox.files.FileMetadata of the files in
+        all the folders.
+    cursorList : list of str
+        cursor of every folder.
+    """
+
+    metadataDict,cursorList = {},[]
+    for folder in folderList:
+        cursorList.append(listFolder(dbx,folder,metadataDict,pathSet,fallback))
+    return metadataDict,cursorList
+############################################################
+
+############################################################
+def waitForChanges(dbx,cursorList,timeLimit_s):
+    """ Wait until there is a change in one of the folders of
+    cursorList using files_list_folder_longpoll, or until timeLimit_s
+    seconds have passed. The folders are watched one after the other,
+    each with an equal share of timeLimit_s as longpoll timeout,
+    between 30 s (the shortest longpoll) and 480 s, and never longer
+    than the time left. Without any cursor it sleeps for timeLimit_s.
+
+    Usage:
+    -----
+    changes = waitForChanges(dbx,cursorList,timeLimit_s)
+
+    Returns:
+    -------
+    changes : bool
+        True if there was a change.
+    """
+
+    if not(cursorList):
+        time.sleep(timeLimit_s)
+        return False
+    tic = time.time()
+    timeout = min(480,max(30,timeLimit_s/len(cursorList)))
+    while (True):
+        for cursor in cursorList:
+            remaining = timeLimit_s-(time.time()-tic)
+            if (remaining<30):
+                time.sleep(max(0,remaining))
+                return False
+            result = dbx.files_list_folder_longpoll(cursor,timeout=int(min(timeout,remaining)))
+            if (result.changes):
+                return True
+            if (result.backoff is not None):
+                time.sleep(min(result.backoff,max(0,timeLimit_s-(time.time()-tic))))
+############################################################
+
+############################################################
+def findUploaded(dbx,fileNameList,fileSizeList,dropboxWebFileList,cache,offsetList=None,rootDirList=None):
+    """ Find the files that are already on Dropbox cloud. The folders
+    of dropboxWebFileList are listed recursively, and a file is already
+    uploaded if a file with the same path and size is on Dropbox and
+    its content_hash is the same as the local one. A whole file also
+    has to still have that size on disk, and its content_hash is
+    computed over the whole file, so a file that has grown since it
+    was listed never matches an earlier upload. Only a part of a
+    virtually split file is hashed as a byte range. The local
+    content_hash is only computed for the files whose path and size
+    match, and it is read from cache if the file has not changed.
+
+    Parameters:
+    ----------
+    dbx : dropbox.Dropbox
+        Dropbox client.
+    fileNameList : list of str
+        local files.
+    fileSizeList : list of int
+        size in bytes of every file, or of every part.
+    dropboxWebFileList : list of str
+        corresponding files with full path on Dropbox cloud.
+    cache : hashCache.hashCache
+        cache of local content_hash values.
+    offsetList : list of int or None
+        position of the part in every file, None for a whole file (see
+        manifest.uploadManifest). Default is None, whole files.
+    rootDirList : list of str
+        folders to list, see getTopFolders(). Default is None.
+
+    Returns:
+    -------
+    uploadedList : list of bool
+        True for the files already on Dropbox.
+
+    Usage:
+    -----
+    uploadedList = findUploaded(dbx,fileNameList,fileSizeList,dropboxWebFileList,cache)
+    """
+
+    if (offsetList is None):
+        offsetList = [None]*len(fileNameList)
+    pathSet = set(fileName.lower() for fileName in dropboxWebFileList)
+    metadataDict,cursorList = listFolders(dbx,getTopFolders(dropboxWebFileList,rootDirList),pathSet,fallback=False)
+    uploadedList = []
+    for fileName,fileSize,dropboxWebFile,offset in zip(fileNameList,fileSizeList,dropboxWebFileList,offsetList):
+        metadata = metadataDict.get(dropboxWebFile.lower())
+        if (metadata is None or metadata.size!=fileSize):
+            uploadedList.append(False)
+        elif (offset is None):
+            try:
+                localSize = os.stat(fileName).st_size
+            except OSError:
+                localSize = None
+            uploadedList.append(localSize==fileSize and cache.contentHash(fileName)==metadata.content_hash)
+        else:
+            uploadedList.append(cache.contentHash(fileName,offset,fileSize)==metadata.content_hash)
+    return uploadedList
+############################################################
@@ -0,0 +1,71 @@
+import os
+import sqlite3
+import contentHash
+
+class hashCache:
+    """ hashCache class keeps the Dropbox content_hash of local files in
+    an SQLite database so that a file that has not changed is not read
+    again. A file is identified by its device, inode, modification time
+    and size, so a renamed or moved file is still found, and a file
+    that is modified gets a new entry. The part of a file that is
+    uploaded as a virtual split is stored with its offset and length.
+
+    Parameters:
+    ----------
+    cacheFile : str
+        name of the SQLite database. It is created if it does not
+        exist. If None, the database is only kept in memory.
+
+    Methods:
+    -------
+    contentHash(fileName,offset,length)
+    close()
+
+    Usage:
+    -----
+    import hashCache
+    cache = hashCache.hashCache('./logs/hashCache.db')
+    localHash = cache.contentHash(fileName)
+    """
+
+    ############################################################
+    def __init__(self,cacheFile=None):
+        self.cacheFile = cacheFile
+        self.conn = sqlite3.connect(self.cacheFile or ':memory:')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS hashes (device INTEGER, inode INTEGER, mtime INTEGER, size INTEGER, offset INTEGER, length INTEGER, contentHash TEXT, PRIMARY KEY (device,inode,mtime,size,offset,length))')
+        self.conn.commit()
+    ############################################################
+
+    ############################################################
+    def contentHash(self,fileName,offset=0,length=None):
+        """ Return the Dropbox content_hash of length bytes of fileName
+        starting at offset, from the cache if the file has not changed,
+        otherwise by reading the file.
+
+        Usage:
+        -----
+        localHash = self.contentHash(fileName,offset,length)
+
+        Returns:
+        -------
+        localHash : str
+            Dropbox content_hash.
+        """
+
+        stat = os.stat(fileName)
+        if (length is None):
+            length = stat.st_size-offset
+        key = (stat.st_dev,stat.st_ino,stat.st_mtime_ns,stat.st_size,offset,length)
+        row = self.conn.execute('SELECT contentHash FROM hashes WHERE device=? AND inode=? AND mtime=? AND size=? AND offset=? AND length=?',key).fetchone()
+        if (row is not None):
+            return row[0]
+        localHash = contentHash.fileContentHash(fileName,length=length,offset=offset).hexdigest()
+        self.conn.execute('INSERT OR REPLACE INTO hashes VALUES (?,?,?,?,?,?,?)',key+(localHash,))
+        self.conn.commit()
+        return localHash
+    ############################################################
+
+    ############################################################
+    def close(self):
+        self.conn.close()
+    ############################################################
@@ -0,0 +1,203 @@
+import json
+
+############################################################
+class uploadManifest:
+    """ uploadManifest class holds the final list of files to upload,
+    after large files have been split, with their size and Dropbox
+    destination. It is created by dataPrep and passed to dropboxApp
+    or dropboxAPI so that the files are not scanned a second time.
+
+    An entry can also be a part of a larger file that has not been
+    split on disk (virtual split). Its offset is the position of the
+    part in the file and its size is the length of the part. Only
+    dropboxAPI can upload these entries.
+
+    Methods:
+    -------
+    addFile(fileName,fileSize,dropboxFile,dropboxDir,offset)
+    addRoot(dropboxDir)
+    entries()
+    hasVirtualSplits()
+    toDict()
+    save(jsonFile)
+
+    Attributes:
+    ----------
+    fileNameList : list of str
+        List of all the files to be uploaded to Dropbox.
+    fileSizeList : list of int
+        Corresponding size in bytes of all the files.
+    dropboxFileList : list of str
+        Corresponding file name with full path in the Dropbox
+        directory. This is the local Dropbox directory for the APP
+        and the cloud directory for the API.
+    dropboxDirList : list of str
+        Corresponding directory of every file in the Dropbox
+        directory.
+    offsetList : list of int or None
+        Position in the file where the part to upload starts, or None
+        if the whole file is uploaded.
+    rootDirList : list of str
+        Destination directory of every row of the excel sheet. Every
+        file is inside one of them, so they are the folders that are
+        listed on Dropbox.
+
+    Usage:
+    -----
+    import manifest
+    mf = manifest.uploadManifest()
+    mf.addFile(fileName,fileSize,dropboxFile,dropboxDir)
+    mf.save('manifest.json')
+    mf = manifest.loadManifest('manifest.json')
+    """
+
+    ############################################################
+    def __init__(self):
+        self.fileNameList = []
+        self.fileSizeList = []
+        self.dropboxFileList = []
+        self.dropboxDirList = []
+        self.offsetList = []
+        self.rootDirList = []
+    ############################################################
+
+    ############################################################
+    def __len__(self):
+        return len(self.fileNameList)
+    ############################################################
+
+    ############################################################
+    def addFile(self,fileName,fileSize,dropboxFile,dropboxDir,offset=None):
+        """ Add one file to the end of the manifest. If offset is
+        given, only fileSize bytes of the file starting at offset are
+        uploaded to dropboxFile.
+
+        Usage:
+        -----
+        self.addFile(fileName,fileSize,dropboxFile,dropboxDir,offset)
+
+        Returns:
+        -------
+        NULL
+        """
+
+        self.fileNameList.append(fileName)
+        self.fileSizeList.append(int(fileSize))
+        self.dropboxFileList.append(dropboxFile)
+        self.dropboxDirList.append(dropboxDir)
+        self.offsetList.append(None if (offset is None) else int(offset))
+    ############################################################
+
+    ############################################################
+    def addRoot(self,dropboxDir):
+        """ Add the destination directory of a row of the excel sheet.
+
+        Usage:
+        -----
+        self.addRoot(dropboxDir)
+
+        Returns:
+        -------
+        NULL
+        """
+
+        if (dropboxDir not in self.rootDirList):
+            self.rootDirList.append(dropboxDir)
+    ############################################################
+
+    ############################################################
+    def entries(self):
+        """ Iterate over (fileName,fileSize,dropboxFile,dropboxDir) of
+        every file in the manifest.
+
+        Usage:
+        -----
+        for fileName,fileSize,dropboxFile,dropboxDir in self.entries():
+        """
+
+        return zip(self.fileNameList,self.fileSizeList,self.dropboxFileList,self.dropboxDirList)
+    ############################################################
+
+    ############################################################
+    def hasVirtualSplits(self):
+        """ Return True if any entry is a part of a file that was not
+        split on disk.
+
+        Usage:
+        -----
+        flag = self.hasVirtualSplits()
+        """
+
+        return any(offset is not None for offset in self.offsetList)
+    ############################################################
+
+    ############################################################
+    def toDict(self):
+        """ Return the manifest as a dictionary of lists that can be
+        written with json.
+
+        Usage:
+        -----
+        manifestDict = self.toDict()
+        """
+
+        return {
+            'fileNameList':self.fileNameList,\
+            'fileSizeList':self.fileSizeList,\
+            'dropboxFileList':self.dropboxFileList,\
+            'dropboxDirList':self.dropboxDirList,\
+            'offsetList':self.offsetList,\
+            'rootDirList':self.rootDirList\
+            }
+    ############################################################
+
+    ############################################################
+    def save(self,jsonFile):
+        """ Write the manifest to a json file.
+
+        Usage:
+        -----
+        self.save(jsonFile)
+
+        Returns:
+        -------
+        NULL
+        """
+
+        with open(jsonFile,'w') as f:
+            json.dump(self.toDict(),f)
+    ############################################################
+############################################################
+
+
+############################################################
+def fromDict(manifestDict):
+    """ Create an uploadManifest from the dictionary returned by
+    uploadManifest.toDict().
+
+    Usage:
+    -----
+    mf = fromDict(manifestDict)
+    """
+
+    mf = uploadManifest()
+    offsetList = manifestDict.get('offsetList',[None]*len(manifestDict['fileNameList']))
+    for fileName,fileSize,dropboxFile,dropboxDir,offset in zip(manifestDict['fileNameList'],manifestDict['fileSizeList'],manifestDict['dropboxFileList'],manifestDict['dropboxDirList'],offsetList):
+        mf.addFile(fileName,fileSize,dropboxFile,dropboxDir,offset)
+    for dropboxDir in manifestDict.get('rootDirList',[]):
+        mf.addRoot(dropboxDir)
+    return mf
+############################################################
+
+############################################################
+def loadManifest(jsonFile):
+    """ Read an uploadManifest written by uploadManifest.save().
+
+    Usage:
+    -----
+    mf = loadManifest(jsonFile)
+    """
+
+    with open(jsonFile,'r') as f:
+        return fromDict(json.load(f))
+############################################################
@@ -0,0 +1,117 @@
+import os
+import json
+import threading
+
+class moveJournal:
+    """ moveJournal class records the files that dropboxApp moves into
+    the local Dropbox directory until they are verified on Dropbox or
+    moved back. A moved file is no longer in its source directory, so
+    if the program stops before the file is verified, the next run
+    finds it in the journal and can move it back.
+
+    The journal is rewritten atomically after every change, and a file
+    is recorded before it is moved.
+
+    Parameters:
+    ----------
+    journalFile : str
+        name of the json file where the journal is kept. If None, the
+        journal is only kept in memory. Default is None.
+
+    Methods:
+    -------
+    add(fileNameList,dropboxFileList)
+    remove(fileNameList)
+    items()
+
+    Usage:
+    -----
+    import moveJournal
+    journal = moveJournal.moveJournal('./logs/upload/moveJournal.json')
+    journal.add(fileNameList,dropboxFileList)
+    """
+
+    ############################################################
+    def __init__(self,journalFile=None):
+        self.journalFile = journalFile
+        self.lock = threading.Lock()
+        self.moveDict = {}
+        if (self.journalFile is not None and os.path.exists(self.journalFile)):
+            with open(self.journalFile,'r') as f:
+                self.moveDict = json.load(f)
+    ############################################################
+
+    ############################################################
+    def add(self,fileNameList,dropboxFileList):
+        """ Record that the files of fileNameList are about to be moved
+        to dropboxFileList.
+
+        Usage:
+        -----
+        self.add(fileNameList,dropboxFileList)
+
+        Returns:
+        -------
+        NULL
+        """
+
+        if (len(fileNameList)==0):
+            return
+        with self.lock:
+            for fileName,dropboxFile in zip(fileNameList,dropboxFileList):
+                self.moveDict[fileName] = dropboxFile
+            self.save()
+    ############################################################
+
+    ############################################################
+    def remove(self,fileNameList):
+        """ Forget the files of fileNameList, after they are verified
+        on Dropbox or moved back.
+
+        Usage:
+        -----
+        self.remove(fileNameList)
+
+        Returns:
+        -------
+        NULL
+        """
+
+        with self.lock:
+            numFiles = len(self.moveDict)
+            for fileName in fileNameList:
+                self.moveDict.pop(fileName,None)
+            if (len(self.moveDict)<numFiles):
+                self.save()
+    ############################################################
+
+    ############################################################
+    def items(self):
+        """ Return the recorded files.
+
+        Usage:
+        -----
+        for fileName,dropboxFile in self.items():
+            ...
+
+        Returns:
+        -------
+        itemList : list of tuple
+            (fileName,dropboxFile) of every recorded file.
+        """
+
+        with self.lock:
+            return list(self.moveDict.items())
+    ############################################################
+
+    ############################################################
+    def save(self):
+        if (self.journalFile is None):
+            return
+        tempFile = self.journalFile+'.tmp'
+        with open(tempFile,'w') as f:
+            json.dump(self.moveDict,f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tempFile,self.journalFile)
+    ############################################################
@@ -0,0 +1,308 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+exclusionList = [
+    'desktop.ini',\
+    'thumbs.db',\
+    'Thumbs.db',\
+    '.ds_store',\
+    '.DS_Store',\
+    '._.DS_Store',\
+    '.dropbox',\
+    '.dropbox.attr'\
+    ]
+
+numThreads = 32
+
+############################################################
+def scanOneDir(dirName,exclusionList=[]):
+    """ Scan a single directory using os.scandir. The size of every
+    file is taken from the directory entry, which on Windows comes
+    for free with the directory listing and on Linux costs one stat
+    call that can run concurrently with the other threads.
+
+    Parameters:
+    ----------
+    dirName : str
+        directory to scan.
+    exclusionList : list of str
+        file names that are ignored.
+
+    Returns:
+    -------
+    dirName : str
+        the scanned directory.
+    subDirList : list of str
+        subdirectories with full path. Symbolic links to directories
+        are not followed, same as os.walk.
+    fileNameList : list of str
+        files with full path.
+    fileSizeList : list of int
+        corresponding file size in bytes.
+
+    Usage:
+    -----
+    dirName,subDirList,fileNameList,fileSizeList = scanOneDir(dirName)
+    """
+
+    subDirList,fileNameList,fileSizeList = [],[],[]
+    try:
+        entryList = list(os.scandir(dirName))
+    except OSError:
+        return dirName,subDirList,fileNameList,fileSizeList
+    for entry in entryList:
+        try:
+            if (entry.is_dir()):
+                if not(entry.is_symlink()):
+                    subDirList.append(entry.path)
+            elif (entry.name not in exclusionList):
+                fileSize = entry.stat().st_size
+                fileNameList.append(entry.path)
+                fileSizeList.append(fileSize)
+        except OSError:
+            pass
+    return dirName,subDirList,fileNameList,fileSizeList
+############################################################
+
+############################################################
+def statFiles(fileNameList):
+    """ Read the size and modification time of a list of files with
+    one stat call each.
+
+    Returns:
+    -------
+    fileSizeList : list of int
+        file size in bytes.
+    fileMtimeList : list of int
+        modification time in nanoseconds, None if the file could not
+        be read.
+
+    Usage:
+    -----
+    fileSizeList,fileMtimeList = statFiles(fileNameList)
+    """
+
+    fileSizeList,fileMtimeList = [],[]
+    for fileName in fileNameList:
+        try:
+            stat = os.stat(fileName)
+            fileSizeList.append(stat.st_size)
+            fileMtimeList.append(stat.st_mtime_ns)
+        except OSError:
+            fileSizeList.append(0)
+            fileMtimeList.append(None)
+    return fileSizeList,fileMtimeList
+############################################################
+
+############################################################
+def scanIndexedDir(dirName,cacheDict):
+    """ Scan a single directory unless it is unchanged since the scan
+    stored in cacheDict, in which case the stored record is reused.
+    The modification time is read before the directory is listed so
+    that a change made during the listing is picked up next time.
+    A file modified in place does not change the modification time
+    of its directory, so the files of an unchanged directory are
+    stat'ed again and the size of every file whose size or
+    modification time differs from the index is updated.
+
+    Parameters:
+    ----------
+    dirName : str
+        directory to scan.
+    cacheDict : dict
+        dirName -> (mtime,subDirList,fileNameList,fileSizeList,fileMtimeList)
+        as returned by scanIndex.load().
+
+    Returns:
+    -------
+    record : tuple
+        (dirName,subDirList,fileNameList,fileSizeList) without any
+        file excluded.
+    mtime : int
+        modification time of the directory in nanoseconds.
+    fileMtimeList : list of int
+        modification time of every file in nanoseconds.
+    changed : bool
+        True if the directory or one of its files changed.
+
+    Usage:
+    -----
+    record,mtime,fileMtimeList,changed = scanIndexedDir(dirName,cacheDict)
+    """
+
+    try:
+        mtime = os.stat(dirName).st_mtime_ns
+    except OSError:
+        return (dirName,[],[],[]),None,[],True
+    cached = cacheDict.get(dirName)
+    if (cached is not None and cached[0]==mtime and cached[4] is not None):
+        fileSizeList,fileMtimeList = statFiles(cached[2])
+        if (None not in fileMtimeList):
+            changed = fileSizeList!=cached[3] or fileMtimeList!=cached[4]
+            return (dirName,cached[1],cached[2],fileSizeList),mtime,fileMtimeList,changed
+    dirName,subDirList,fileNameList,fileSizeList = scanOneDir(dirName)
+    fileSizeList,fileMtimeList = statFiles(fileNameList)
+    keepList = [i for i,fileMtime in enumerate(fileMtimeList) if fileMtime is not None]
+    fileNameList = [fileNameList[i] for i in keepList]
+    fileSizeList = [fileSizeList[i] for i in keepList]
+    fileMtimeList = [fileMtimeList[i] for i in keepList]
+    return (dirName,subDirList,fileNameList,fileSizeList),mtime,fileMtimeList,True
+############################################################
+
+############################################################
+def walkDir(inputDir,exclusionList=[],numThreads=numThreads,index=None):
+    """ Walk a directory tree concurrently. Every directory is
+    scanned by scanOneDir in a thread pool and its subdirectories
+    are submitted as soon as they are found, so slow network
+    storage is kept busy with many outstanding requests.
+
+    If a scanIndex is given, directories that have not changed since
+    the previous scan are taken from the index without being listed,
+    and only the size and modification time of their files are read
+    again, see scanIndexedDir(). The index is updated at the end.
+
+    Parameters:
+    ----------
+    inputDir : str
+        top directory to walk.
+    exclusionList : list of str
+        file names that are ignored.
+    numThreads : int
+        number of directories scanned at the same time.
+    index : scanIndex.scanIndex
+        index of previous scans. Default is None.
+
+    Returns:
+    -------
+    dirRecordList : list of tuple
+        (dirName,subDirList,fileNameList,fileSizeList) for every
+        directory in the tree. The directories are in the same top
+        down order as os.walk, i.e. a parent is always followed by
+        all its subdirectories.
+
+    Usage:
+    -----
+    dirRecordList = walkDir(inputDir)
+    """
+
+    recordDict,mtimeDict,fileMtimeDict,changedDirSet = {},{},{},set()
+    if (index is None):
+        task,args = scanOneDir,(exclusionList,)
+    else:
+        task,args = scanIndexedDir,(index.load(inputDir),)
+    with ThreadPoolExecutor(max_workers=numThreads) as executor:
+        pending = {executor.submit(task,inputDir,*args)}
+        while pending:
+            done,pending = wait(pending,return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                if (index is not None):
+                    record,mtime,fileMtimeList,changed = record
+                    if (mtime is not None):
+                        mtimeDict[record[0]] = mtime
+                        fileMtimeDict[record[0]] = fileMtimeList
+                        if (changed):
+                            changedDirSet.add(record[0])
+                recordDict[record[0]] = record
+                for subDir in record[1]:
+                    pending.add(executor.submit(task,subDir,*args))
+
+    dirRecordList,stack = [],[inputDir]
+    while stack:
+        record = recordDict[stack.pop()]
+        dirRecordList.append(record)
+        stack.extend(reversed(record[1]))
+
+    if (index is not None):
+        index.save(inputDir,dirRecordList,mtimeDict,changedDirSet,fileMtimeDict)
+        if (exclusionList):
+            for i,(dirName,subDirList,fileNameList,fileSizeList) in enumerate(dirRecordList):
+                keepList = [j for j,fileName in enumerate(fileNameList) if os.path.basename(fileName) not in exclusionList]
+                if (len(keepList)<len(fileNameList)):
+                    dirRecordList[i] = (dirName,subDirList,[fileNameList[j] for j in keepList],[fileSizeList[j] for j in keepList])
+    return dirRecordList
+############################################################
+
+############################################################
+def getFilesInDir(inputDir,outputDir=None,exclusionList=[],numThreads=numThreads,index=None):
+    """ Creates a list of files inside a directory and, if outputDir
+    is given, the corresponding destination of every file.
+
+    Parameters:
+    ----------
+    inputDir : str
+        directory to scan.
+    outputDir : str
+        directory that replaces inputDir in the destination file
+        names. If None, the destinations are not created.
+    exclusionList : list of str
+        file names that are ignored.
+    numThreads : int
+        number of directories scanned at the same time.
+    index : scanIndex.scanIndex
+        index of previous scans. Default is None.
+
+    Returns:
+    -------
+    fileNameList : list of str
+        List of all the files inside inputDir.
+    fileSizeList : list of int
+        List of corresponding file size in bytes.
+    outputFileList : list of str
+        List of corresponding files in outputDir.
+    outputDirList : list of str
+        List of corresponding directories in outputDir.
+
+    Usage:
+    -----
+    fileNameList,fileSizeList,outputFileList,outputDirList = getFilesInDir(inputDir,outputDir)
+    """
+
+    fileNameList,fileSizeList,outputFileList,outputDirList = [],[],[],[]
+    for dirName,subDirList,tempFileNameList,tempFileSizeList in walkDir(inputDir,exclusionList,numThreads,index):
+        fileNameList.extend(tempFileNameList)
+        fileSizeList.extend(tempFileSizeList)
+        if (outputDir is not None):
+            outputSubDir = dirName.replace(inputDir,outputDir)
+            for fileName in tempFileNameList:
+                outputFileList.append(fileName.replace(inputDir,outputDir))
+                outputDirList.append(outputSubDir)
+    return fileNameList,fileSizeList,outputFileList,outputDirList
+############################################################
+
+############################################################
+def rollupDirs(dirRecordList):
+    """ Calculate the total number of subdirectories, number of files
+    and size of every directory in one bottom up pass over the
+    records returned by walkDir. Each directory only adds the totals
+    of its own subdirectories, so the cost is linear in the number of
+    directories.
+
+    Parameters:
+    ----------
+    dirRecordList : list of tuple
+        (dirName,subDirList,fileNameList,fileSizeList) in the top down
+        order returned by walkDir.
+
+    Returns:
+    -------
+    dirTotalDict : dict
+        dirName -> [numSubDir,numFiles,size] where size is in bytes
+        and all the numbers include every level of subdirectories.
+
+    Usage:
+    -----
+    dirTotalDict = rollupDirs(walkDir(inputDir))
+    """
+
+    dirTotalDict = {}
+    for dirName,subDirList,fileNameList,fileSizeList in reversed(dirRecordList):
+        numSubDir,numFiles,size = 0,len(fileNameList),sum(fileSizeList)
+        for subDir in subDirList:
+            subNumSubDir,subNumFiles,subSize = dirTotalDict[subDir]
+            numSubDir += 1+subNumSubDir
+            numFiles += subNumFiles
+            size += subSize
+        dirTotalDict[dirName] = [numSubDir,numFiles,size]
+    return dirTotalDict
+############################################################
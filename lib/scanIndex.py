@@ -0,0 +1,111 @@
+import os
+import json
+import sqlite3
+
+class scanIndex:
+    """ scanIndex class keeps the result of previous directory scans in
+    an SQLite database so that a rerun only lists the directories that
+    have changed since.
+
+    Every directory is stored with its modification time, its
+    subdirectories and its files with their size and modification
+    time. Adding, removing or renaming an entry updates the
+    modification time of the directory, so a directory whose
+    modification time is unchanged is reused from the index without
+    being listed again. A file that is modified in place does not
+    change the directory modification time, so the files of a reused
+    directory are stat'ed again and their size is only taken from the
+    index if their size and modification time are unchanged.
+
+    Parameters:
+    ----------
+    indexFile : str
+        name of the SQLite database. It is created if it does not
+        exist.
+
+    Methods:
+    -------
+    load(inputDir)
+    save(inputDir,dirRecordList,mtimeDict,changedDirSet,fileMtimeDict)
+    close()
+
+    Usage:
+    -----
+    import scanIndex
+    index = scanIndex.scanIndex('./logs/scanIndex.db')
+    dirRecordList = scanDir.walkDir(inputDir,index=index)
+    """
+
+    ############################################################
+    def __init__(self,indexFile):
+        self.indexFile = indexFile
+        self.conn = sqlite3.connect(self.indexFile)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS dirs (dirName TEXT PRIMARY KEY, topDir TEXT, mtime INTEGER, subDirs TEXT, fileNames TEXT, fileSizes TEXT)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS dirsTopDir ON dirs (topDir)')
+        if ('fileMtimes' not in [row[1] for row in self.conn.execute('PRAGMA table_info(dirs)')]):
+            self.conn.execute('ALTER TABLE dirs ADD COLUMN fileMtimes TEXT')
+        self.conn.commit()
+    ############################################################
+
+    ############################################################
+    def load(self,inputDir):
+        """ Read all the directories stored for the scan of inputDir.
+
+        Returns:
+        -------
+        cacheDict : dict
+            dirName -> (mtime,subDirList,fileNameList,fileSizeList,fileMtimeList)
+            with subdirectories and files as full paths. fileMtimeList
+            is None for a directory stored by an older version, which
+            is then listed again.
+
+        Usage:
+        -----
+        cacheDict = self.load(inputDir)
+        """
+
+        cacheDict = {}
+        for dirName,mtime,subDirs,fileNames,fileSizes,fileMtimes in self.conn.execute('SELECT dirName,mtime,subDirs,fileNames,fileSizes,fileMtimes FROM dirs WHERE topDir=?',(inputDir,)):
+            subDirList = [os.path.join(dirName,name) for name in json.loads(subDirs)]
+            fileNameList = [os.path.join(dirName,name) for name in json.loads(fileNames)]
+            fileMtimeList = json.loads(fileMtimes) if (fileMtimes is not None) else None
+            cacheDict[dirName] = (mtime,subDirList,fileNameList,json.loads(fileSizes),fileMtimeList)
+        return cacheDict
+    ############################################################
+
+    ############################################################
+    def save(self,inputDir,dirRecordList,mtimeDict,changedDirSet,fileMtimeDict):
+        """ Store the result of a scan of inputDir. Only the
+        directories in changedDirSet are written, with the
+        modification times of their files from fileMtimeDict, and
+        directories that no longer exist are removed from the index.
+
+        Usage:
+        -----
+        self.save(inputDir,dirRecordList,mtimeDict,changedDirSet,fileMtimeDict)
+
+        Returns:
+        -------
+        NULL
+        """
+
+        rowList = []
+        for dirName,subDirList,fileNameList,fileSizeList in dirRecordList:
+            if (dirName in changedDirSet):
+                rowList.append((dirName,inputDir,mtimeDict[dirName],\
+                    json.dumps([os.path.basename(name) for name in subDirList]),\
+                    json.dumps([os.path.basename(name) for name in fileNameList]),\
+                    json.dumps(fileSizeList),\
+                    json.dumps(fileMtimeDict[dirName])))
+        self.conn.executemany('INSERT OR REPLACE INTO dirs (dirName,topDir,mtime,subDirs,fileNames,fileSizes,fileMtimes) VALUES (?,?,?,?,?,?,?)',rowList)
+
+        existingDirSet = set(mtimeDict)
+        removedDirList = [(dirName,) for (dirName,) in self.conn.execute('SELECT dirName FROM dirs WHERE topDir=?',(inputDir,)) if dirName not in existingDirSet]
+        self.conn.executemany('DELETE FROM dirs WHERE dirName=?',removedDirList)
+        self.conn.commit()
+    ############################################################
+
+    ############################################################
+    def close(self):
+        self.conn.close()
+    ############################################################
@@ -0,0 +1,125 @@
+import time
+import psutil
+
+############################################################
+class syncMonitor:
+    """ syncMonitor class watches the Dropbox desktop application and
+    tells when it has stopped syncing. Every sampleTime_s seconds the
+    disk read/write bytes of the Dropbox processes and the bytes sent
+    on the network interfaces are read with psutil. The application is
+    idle once the throughput stays below r_wSpeedCutOff for window_s
+    seconds.
+
+    psutil has no network counters per process, so the bytes sent by
+    the whole computer are used. If the Dropbox process is not found or
+    its disk counters cannot be read, only the network is used.
+
+    Parameters:
+    ----------
+    r_wSpeedCutOff : float
+        throughput in MB/s below which Dropbox is idle. Default is 0.5.
+    window_s : float
+        time in seconds the throughput has to stay below the cutoff.
+        Default is 120 s.
+    sampleTime_s : float
+        time in seconds between two samples. Default is 10 s.
+
+    Methods:
+    -------
+    findProcesses()
+    counters()
+    waitForIdle(timeLimit_s)
+
+    Usage:
+    -----
+    import syncMonitor
+    monitor = syncMonitor.syncMonitor(r_wSpeedCutOff=0.5)
+    idle = monitor.waitForIdle(30*60)
+    """
+
+    ############################################################
+    def __init__(self,r_wSpeedCutOff=0.5,window_s=120,sampleTime_s=10):
+        self.r_wSpeedCutOff = r_wSpeedCutOff
+        self.window_s = window_s
+        self.sampleTime_s = sampleTime_s
+        self.processList = []
+    ############################################################
+
+    ############################################################
+    def findProcesses(self):
+        """ Find the running processes of the Dropbox desktop
+        application.
+
+        Usage:
+        -----
+        self.findProcesses()
+
+        Returns:
+        -------
+        processList : list of psutil.Process
+        """
+
+        self.processList = []
+        for process in psutil.process_iter():
+            try:
+                if ('dropbox' in process.name().lower()):
+                    self.processList.append(process)
+            except psutil.Error:
+                pass
+        return self.processList
+    ############################################################
+
+    ############################################################
+    def counters(self):
+        """ Return the total number of bytes read and written by the
+        Dropbox processes plus the bytes sent on the network.
+
+        Usage:
+        -----
+        numBytes = self.counters()
+        """
+
+        numBytes = psutil.net_io_counters().bytes_sent
+        for process in list(self.processList):
+            try:
+                io = process.io_counters()
+                numBytes += io.read_bytes+io.write_bytes
+            except (psutil.Error,AttributeError):
+                self.processList.remove(process)
+        return numBytes
+    ############################################################
+
+    ############################################################
+    def waitForIdle(self,timeLimit_s):
+        """ Wait until the throughput has stayed below
+        self.r_wSpeedCutOff for self.window_s seconds, or until
+        timeLimit_s seconds have passed.
+
+        Usage:
+        -----
+        idle = self.waitForIdle(timeLimit_s)
+
+        Returns:
+        -------
+        idle : bool
+            True if Dropbox became idle within timeLimit_s.
+        """
+
+        self.findProcesses()
+        tic = time.time()
+        idleSince = None
+        previousBytes,previousTime = self.counters(),time.time()
+        while (time.time()-tic<timeLimit_s):
+            time.sleep(self.sampleTime_s)
+            numBytes,sampleTime = self.counters(),time.time()
+            speed = (numBytes-previousBytes)/1024/1024/max(sampleTime-previousTime,1e-6)
+            previousBytes,previousTime = numBytes,sampleTime
+            if (speed>=self.r_wSpeedCutOff):
+                idleSince = None
+            elif (idleSince is None):
+                idleSince = sampleTime-self.sampleTime_s
+            if (idleSince is not None and sampleTime-idleSince>=self.window_s):
+                return True
+        return False
+    ############################################################
+############################################################
@@ -0,0 +1,129 @@
+import os
+import json
+import threading
+
+class uploadJournal:
+    """ uploadJournal class records the Dropbox upload session of every
+    file that is being uploaded in chunks, together with the offset up
+    to which Dropbox has acknowledged the data. A failed upload, or a
+    new run of the program, continues the session from that offset
+    instead of sending the file again from the start.
+
+    A session is only reused for the same local file with the same size
+    and modification time. The journal is rewritten atomically after
+    every change. When the offset is on a 4 MB block boundary, the
+    block hashes of the data sent so far are kept as well so that the
+    content_hash does not need the start of the file to be read again.
+
+    Parameters:
+    ----------
+    journalFile : str
+        name of the json file where the journal is kept. If None, the
+        journal is only kept in memory and sessions are resumed within
+        the same run. Default is None.
+
+    Methods:
+    -------
+    get(fileName,dropboxFile)
+    update(fileName,dropboxFile,sessionId,offset,hashState)
+    remove(dropboxFile)
+
+    Usage:
+    -----
+    import uploadJournal
+    journal = uploadJournal.uploadJournal('./logs/upload/uploadJournal.json')
+    session = journal.get(fileName,dropboxFile)
+    if (session is not None):
+        sessionId,offset,hashState = session
+    """
+
+    ############################################################
+    def __init__(self,journalFile=None):
+        self.journalFile = journalFile
+        self.lock = threading.Lock()
+        self.sessionDict = {}
+        if (self.journalFile is not None and os.path.exists(self.journalFile)):
+            with open(self.journalFile,'r') as f:
+                self.sessionDict = json.load(f)
+    ############################################################
+
+    ############################################################
+    def fileId(self,fileName):
+        stat = os.stat(fileName)
+        return [fileName,stat.st_size,stat.st_mtime_ns]
+    ############################################################
+
+    ############################################################
+    def get(self,fileName,dropboxFile):
+        """ Return the session of a previous upload of fileName to
+        dropboxFile.
+
+        Usage:
+        -----
+        session = self.get(fileName,dropboxFile)
+
+        Returns:
+        -------
+        session : tuple or None
+            (sessionId,offset,hashState) if there is a session for the
+            same unchanged file, otherwise None. hashState is the list
+            of block hashes from contentHasher.getState(), or None.
+        """
+
+        with self.lock:
+            session = self.sessionDict.get(dropboxFile)
+        if (session is None or session['fileId']!=self.fileId(fileName)):
+            return None
+        return session['sessionId'],session['offset'],session.get('hashState')
+    ############################################################
+
+    ############################################################
+    def update(self,fileName,dropboxFile,sessionId,offset,hashState=None):
+        """ Record that Dropbox has acknowledged the data of fileName
+        up to offset in the session sessionId, with the content hash
+        state of the data up to offset if it is known.
+
+        Usage:
+        -----
+        self.update(fileName,dropboxFile,sessionId,offset,hashState)
+
+        Returns:
+        -------
+        NULL
+        """
+
+        with self.lock:
+            self.sessionDict[dropboxFile] = {'fileId':self.fileId(fileName),'sessionId':sessionId,'offset':offset,'hashState':hashState}
+            self.save()
+    ############################################################
+
+    ############################################################
+    def remove(self,dropboxFile):
+        """ Forget the session of dropboxFile, after the upload is
+        finished or when the session can not be used any more.
+
+        Usage:
+        -----
+        self.remove(dropboxFile)
+
+        Returns:
+        -------
+        NULL
+        """
+
+        with self.lock:
+            if (self.sessionDict.pop(dropboxFile,None) is not None):
+                self.save()
+    ############################################################
+
+    ############################################################
+    def save(self):
+        if (self.journalFile is None):
+            return
+        tempFile = self.journalFile+'.tmp'
+        with open(tempFile,'w') as f:
+            json.dump(self.sessionDict,f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tempFile,self.journalFile)
+    ############################################################
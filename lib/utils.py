@@ -1,4 +1,5 @@
 import os
+import json
 import platform
 import datetime
 
@@ -150,7 +151,11 @@ def deleteFiles(fileNameList):
 
 ############################################################
 def findSplitFiles(inputFile):
-    """ Get all the brother split files in the directory.
+    """ Get all the brother split files of the first split file. If the
+    sidecar file written when the file was split is in the same
+    directory, the split files are read from it. Otherwise the split
+    files _split_0002, _split_0003, ... are looked up one by one until
+    one is missing, so the directory is never listed.
     
     Parameters:
     ----------
@@ -160,28 +165,117 @@ def findSplitFiles(inputFile):
     Returns:
     -------
     splitFileList : list of str
-        list of all the other split files
+        list of all the split files, in order
         
     Usage:
     -----
     splitFileList = findSplitFiles(inputFile)
     """
-    if (platform.system()=='Linux'):
-        tempList = inputFile.split('/')
-        path = ''
-        for temp in tempList[:-1]:
-            path = path+temp+'/'
-    elif (platform.system()=='Windows'):
-        tempList = inputFile.split('\\')
-        path = ''
-        for temp in tempList[:-1]:
-            path = path+temp+'\\'
-    fileName = inputFile.split('_split_0001')[0]+'_split_'
-    dirFileList = listdir(path)
+    
+    fileName = inputFile.split('_split_0001')[0]
+    sidecarFile = fileName+'.split.json'
+    if (os.path.exists(sidecarFile)):
+        return readSplitSidecar(sidecarFile)[1]
     splitFileList = []
-    for dirFile in dirFileList:
-        if (fileName in path+dirFile):
-            splitFileList.append(path+dirFile)
-    splitFileList = list(numpy.sort(splitFileList,kind='mergesort'))
+    splitNum = 1
+    while (os.path.exists(fileName+'_split_'+str(splitNum).zfill(4))):
+        splitFileList.append(fileName+'_split_'+str(splitNum).zfill(4))
+        splitNum += 1
     return splitFileList
-############################################################
\ No newline at end of file
+############################################################
+
+
+############################################################
+def writeSplitSidecar(fileName,fileSize,splitFileList,splitSizeList,hashList):
+    """ Write the sidecar file fileName.split.json next to the split
+    files of fileName. It has the size of the original file, the
+    number of splits, and the name, size and Dropbox content_hash of
+    every split, so that the splits can be found without listing the
+    directory and checked before they are joined.
+    
+    Parameters:
+    ----------
+    fileName : str
+        name of the original file with full path.
+    fileSize : int
+        size of the original file in bytes.
+    splitFileList : list of str
+        split files with full path, in order.
+    splitSizeList : list of int
+        corresponding size of the split files in bytes.
+    hashList : list of str
+        corresponding Dropbox content_hash of the split files. An
+        element can be None if the hash is not known.
+        
+    Returns:
+    -------
+    sidecarFile : str
+        name of the sidecar file with full path.
+    
+    Usage:
+    -----
+    sidecarFile = writeSplitSidecar(fileName,fileSize,splitFileList,splitSizeList,hashList)
+    """
+    
+    sidecarFile = fileName+'.split.json'
+    with open(sidecarFile,'w') as f:
+        json.dump(splitSidecar(fileName,fileSize,splitFileList,splitSizeList,hashList),f,indent=1)
+    return sidecarFile
+############################################################
+
+############################################################
+def splitSidecar(fileName,fileSize,splitFileList,splitSizeList,hashList):
+    """ Return the content of the sidecar file written by
+    writeSplitSidecar() as a dictionary, for a sidecar file that is
+    not written to the local disk.
+    
+    Usage:
+    -----
+    sidecar = splitSidecar(fileName,fileSize,splitFileList,splitSizeList,hashList)
+    """
+    
+    return {
+        'fileName':os.path.basename(fileName),\
+        'fileSize':int(fileSize),\
+        'numSplits':len(splitFileList),\
+        'splitList':[{'name':os.path.basename(splitFile),'size':int(splitSize),'contentHash':contentHash} for splitFile,splitSize,contentHash in zip(splitFileList,splitSizeList,hashList)]\
+        }
+############################################################
+
+
+############################################################
+def readSplitSidecar(sidecarFile):
+    """ Read a sidecar file written by writeSplitSidecar(). The split
+    files are expected in the same directory as the sidecar file.
+    
+    Parameters:
+    ----------
+    sidecarFile : str
+        name of the sidecar file with full path.
+        
+    Returns:
+    -------
+    fileSize : int
+        size of the original file in bytes.
+    splitFileList : list of str
+        split files with full path, in order.
+    splitSizeList : list of int
+        corresponding size of the split files in bytes.
+    hashList : list of str
+        corresponding Dropbox content_hash of the split files.
+    
+    Usage:
+    -----
+    fileSize,splitFileList,splitSizeList,hashList = readSplitSidecar(sidecarFile)
+    """
+    
+    with open(sidecarFile,'r') as f:
+        sidecar = json.load(f)
+    if (sidecar.get('numSplits',len(sidecar['splitList']))!=len(sidecar['splitList'])):
+        raise ValueError('%s lists %d splits, expected %d' %(sidecarFile,len(sidecar['splitList']),sidecar['numSplits']))
+    path = os.path.dirname(sidecarFile)
+    splitFileList = [os.path.join(path,split['name']) for split in sidecar['splitList']]
+    splitSizeList = [split['size'] for split in sidecar['splitList']]
+    hashList = [split.get('contentHash') for split in sidecar['splitList']]
+    return sidecar['fileSize'],splitFileList,splitSizeList,hashList
+############################################################
@@ -0,0 +1,242 @@
+import os
+import time
+import subprocess
+import utils
+import zipStream
+
+class zipScheduler:
+    """ zipScheduler class runs several 7-Zip archive jobs at the same
+    time. A job is started when fewer than maxJobs jobs are running
+    and fewer than jobsPerDisk jobs are reading from the same disk as
+    the directory to archive. The CPU threads are shared between the
+    jobs with the -mmt switch of 7-Zip. When a job finishes its
+    duration, throughput, compression level and compression ratio are
+    written to the log file.
+
+    If job['volumeSize'] is set, 7-Zip writes the archive in volumes
+    of that size (-v switch). When the job finishes the volumes
+    zipFileName.001, zipFileName.002, ... are renamed to
+    zipFileName_split_0001, zipFileName_split_0002, ... with the
+    sidecar file zipFileName.split.json, the same way dataPrep splits
+    a large file, so they are uploaded without being split again and
+    can be joined with joinFiles.py. A single volume is renamed to
+    zipFileName.
+
+    If executable is 'zipfile', the jobs are run in this process with
+    zipStream.zipThread instead of 7-Zip. The archive is written
+    straight to job['destination'], a local file or 'dropbox:' and a
+    file on Dropbox cloud, so no archive is written next to the
+    directory and copied again. With 'zipfile', job['volumeSize'] is
+    only used for a 'dropbox:' destination, where the upload is
+    committed in split files of that size.
+
+    Parameters:
+    ----------
+    executable : str
+        7-Zip executable, or any program that accepts the same command
+        line, or 'zipfile'.
+    logFile : file
+        open log file where a line is written for every job.
+    maxJobs : int
+        maximum number of jobs running at the same time. Default is
+        None, which uses half the number of CPUs.
+    jobsPerDisk : int
+        maximum number of jobs reading from the same disk at the same
+        time. Default is 2.
+    numThreads : int
+        number of CPU threads shared by the jobs. Default is None,
+        which uses the number of CPUs.
+    accessToken : str
+        Dropbox access token, used by 'zipfile' jobs with a 'dropbox:'
+        destination. Default is None.
+
+    Methods:
+    -------
+    addJob(inputDir,zipFileName,deleteFlag,size,numSubDir,numFiles)
+    run()
+
+    Usage:
+    -----
+    import zipScheduler
+    scheduler = zipScheduler.zipScheduler('7za',logFile)
+    scheduler.addJob(inputDir,inputDir+'.zip',0,size,numSubDir,numFiles)
+    scheduler.run()
+    """
+
+    ############################################################
+    def __init__(self,executable,logFile,maxJobs=None,jobsPerDisk=2,numThreads=None,accessToken=None):
+        self.executable = executable
+        self.accessToken = accessToken
+        self.logFile = logFile
+        self.numThreads = numThreads or os.cpu_count() or 1
+        self.maxJobs = maxJobs or max(1,self.numThreads//2)
+        self.jobsPerDisk = jobsPerDisk
+        self.jobList = []
+    ############################################################
+
+    ############################################################
+    def addJob(self,inputDir,zipFileName,deleteFlag,size,numSubDir,numFiles):
+        """ Add a directory to archive. The jobs are started in the
+        order they are added, except that a job waits while its disk
+        is busy and a job on another disk can start before it.
+        size is the size of the directory in GB, as written in
+        directorySize.txt. The 7-Zip compression switch can be set in
+        job['method'], the estimated compression ratio in
+        job['estimatedRatio'], the entropy of the sample in bits per
+        byte in job['entropy'], and the volume size in bytes in
+        job['volumeSize']. With 'zipfile' the archive is written to
+        job['destination'], which is zipFileName by default.
+
+        Usage:
+        -----
+        self.addJob(inputDir,zipFileName,deleteFlag,size,numSubDir,numFiles)
+
+        Returns:
+        -------
+        job : dict
+            the job, which can be changed before self.run() is called.
+        """
+
+        job = {
+            'inputDir':inputDir,\
+            'zipFileName':zipFileName,\
+            'deleteFlag':deleteFlag,\
+            'size':size,\
+            'numSubDir':numSubDir,\
+            'numFiles':numFiles,\
+            'disk':self.diskId(inputDir),\
+            'method':None,\
+            'estimatedRatio':None,\
+            'entropy':None,\
+            'volumeSize':None,\
+            'destination':zipFileName,\
+            'args':[]\
+            }
+        self.jobList.append(job)
+        return job
+    ############################################################
+
+    ############################################################
+    def diskId(self,dirName):
+        try:
+            return os.stat(dirName).st_dev
+        except OSError:
+            return None
+    ############################################################
+
+    ############################################################
+    def command(self,job,numThreads):
+        """ Return the 7-Zip command line of a job.
+
+        Usage:
+        -----
+        cmd = self.command(job,numThreads)
+        """
+
+        cmd = [self.executable,'a',job['zipFileName'],job['inputDir'],'-mmt%d' %(numThreads)]+job['args']
+        if (job['method'] is not None):
+            cmd.append(job['method'])
+        if (job['volumeSize'] is not None):
+            cmd.append('-v%db' %(job['volumeSize']))
+        if (job['deleteFlag']==1):
+            cmd.append('-sdel')
+        return cmd
+    ############################################################
+
+    ############################################################
+    def run(self):
+        """ Run all the jobs and wait until they are finished.
+
+        Usage:
+        -----
+        self.run()
+
+        Returns:
+        -------
+        NULL
+        """
+
+        numJobs = min(self.maxJobs,len(self.jobList))
+        threadsPerJob = max(1,self.numThreads//max(1,numJobs))
+        waitingList,runningList = list(self.jobList),[]
+        while (waitingList or runningList):
+            for job in list(waitingList):
+                if (len(runningList)>=self.maxJobs):
+                    break
+                if (sum(1 for running in runningList if running['disk']==job['disk'])<self.jobsPerDisk):
+                    self.startJob(job,threadsPerJob)
+                    waitingList.remove(job)
+                    runningList.append(job)
+            time.sleep(1)
+            for job in list(runningList):
+                if (job['process'].poll() is not None):
+                    self.finishJob(job)
+                    runningList.remove(job)
+    ############################################################
+
+    ############################################################
+    def startJob(self,job,numThreads):
+        print ('Archiving the folder %s' %(job['inputDir']))
+        if (self.executable=='zipfile'):
+            job['process'] = zipStream.zipThread(job['inputDir'],job['destination'],job['deleteFlag'],job['method'],self.accessToken,job['volumeSize'])
+            job['process'].start()
+        else:
+            job['process'] = subprocess.Popen(self.command(job,numThreads),stdout=subprocess.DEVNULL)
+        job['startTime'] = time.time()
+    ############################################################
+
+    ############################################################
+    def finishJob(self,job):
+        """ Write the duration, throughput and compression ratio of a
+        finished job to the log file. The volumes are only renamed to
+        split files if 7-Zip succeeded, so a partial archive is never
+        given a sidecar file.
+        """
+
+        duration = time.time()-job['startTime']
+        returnCode = job['process'].returncode
+        throughput = job['size']*1024/max(duration,1e-6)
+        if (self.executable=='zipfile'):
+            zipSize = job['process'].zipSize
+        else:
+            if (job['volumeSize'] is not None and returnCode==0):
+                self.renameVolumes(job['zipFileName'])
+            elif (job['volumeSize'] is not None):
+                print ('7-Zip failed on %s, volumes of %s left as they are' %(job['inputDir'],job['zipFileName']))
+            zipFileList = utils.findSplitFiles(job['zipFileName']+'_split_0001') or [job['zipFileName']]
+            zipSize = sum(os.path.getsize(zipFile) for zipFile in zipFileList if os.path.isfile(zipFile))
+        ratio = zipSize/(job['size']*1024*1024*1024) if (job['size']>0) else 0
+        estimatedRatio = '%.3f' %(job['estimatedRatio']) if (job['estimatedRatio'] is not None) else 'NA'
+        entropy = '%.2f' %(job['entropy']) if (job['entropy'] is not None) else 'NA'
+        print ('Archived the folder %s in %.1f s (%.1f MB/s), ratio %.3f%s' %(job['inputDir'],duration,throughput,ratio,'' if returnCode==0 else ', exit code %d' %(returnCode)))
+        self.logFile.write('%s\t%s\t%d\t%d\t%.6f\t%.1f\t%.1f\t%d\t%s\t%s\t%s\t%.3f\n' %(utils.timestamp(),job['inputDir'],job['numSubDir'],job['numFiles'],job['size'],duration,throughput,returnCode,job['method'] or 'default',entropy,estimatedRatio,ratio))
+        self.logFile.flush()
+    ############################################################
+
+    ############################################################
+    def renameVolumes(self,zipFileName):
+        """ Rename the 7-Zip volumes of zipFileName to split files and
+        write their sidecar file.
+
+        Usage:
+        -----
+        self.renameVolumes(zipFileName)
+
+        Returns:
+        -------
+        NULL
+        """
+
+        volumeList,volumeNum = [],1
+        while (os.path.isfile('%s.%03d' %(zipFileName,volumeNum))):
+            volumeList.append('%s.%03d' %(zipFileName,volumeNum))
+            volumeNum += 1
+        if (len(volumeList)==1):
+            os.replace(volumeList[0],zipFileName)
+        elif (len(volumeList)>1):
+            splitFileList = [zipFileName+'_split_'+str(i+1).zfill(4) for i in range(len(volumeList))]
+            splitSizeList = [os.path.getsize(volume) for volume in volumeList]
+            for volume,splitFile in zip(volumeList,splitFileList):
+                os.replace(volume,splitFile)
+            utils.writeSplitSidecar(zipFileName,sum(splitSizeList),splitFileList,splitSizeList,[None]*len(splitFileList))
+    ############################################################
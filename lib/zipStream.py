@@ -0,0 +1,298 @@
+import os
+import json
+import shutil
+import zipfile
+import threading
+import dropbox
+import contentHash
+import utils
+
+chunkSize = 128*1024*1024
+sessionLimit = 350*1024*1024*1024
+
+############################################################
+class uploadSessionWriter:
+    """ uploadSessionWriter class is a write-only file object that
+    sends everything written to it to a Dropbox upload session in
+    chunks of chunkSize bytes. It has no seek(), so zipfile writes the
+    archive as a stream and no archive file is written to disk. The
+    Dropbox content_hash of the bytes sent is checked against every
+    committed file.
+
+    An upload session can hold at most 350 GB. If more than splitSize
+    bytes are written, the stream is committed in parts of splitSize
+    bytes named dropboxFile_split_0001, dropboxFile_split_0002, ...
+    with the sidecar file dropboxFile.split.json, the same way dataPrep
+    splits a large file, so the parts can be joined with joinFiles.py.
+    Files are committed with WriteMode.add, so a file already on
+    Dropbox is never overwritten.
+
+    Parameters:
+    ----------
+    dbx : dropbox.Dropbox
+        Dropbox client.
+    dropboxFile : str
+        file name with full path on Dropbox cloud.
+    chunkSize : int
+        size in bytes of every chunk sent, a multiple of 4 MB. Default
+        is 128 MB.
+    splitSize : int
+        size in bytes of every part. Default is None, which uses the
+        session limit. Larger values are reduced to the session limit.
+
+    Methods:
+    -------
+    write(data)
+    tell()
+    close()
+
+    Usage:
+    -----
+    import zipStream
+    writer = zipStream.uploadSessionWriter(dbx,'/Data/run1.zip')
+    zipStream.zipDir(inputDir,writer)
+    writer.close()
+    """
+
+    ############################################################
+    def __init__(self,dbx,dropboxFile,chunkSize=chunkSize,splitSize=None):
+        self.dbx = dbx
+        self.dropboxFile = dropboxFile
+        self.chunkSize = chunkSize
+        self.splitSize = min(splitSize or sessionLimit,sessionLimit)
+        self.buffer = bytearray()
+        self.sessionId = None
+        self.offset = 0
+        self.partOffset = 0
+        self.hasher = contentHash.contentHasher()
+        self.partList = []
+        self.metadata = None
+    ############################################################
+
+    ############################################################
+    def write(self,data):
+        self.buffer += data
+        while (True):
+            numBytes = min(self.chunkSize,self.splitSize-self.partOffset)
+            if (self.partOffset+numBytes==self.splitSize and len(self.buffer)>numBytes):
+                self.finishPart(bytes(self.buffer[:numBytes]))
+            elif (self.partOffset+numBytes<self.splitSize and len(self.buffer)>=numBytes):
+                self.sendChunk(bytes(self.buffer[:numBytes]))
+            else:
+                break
+            del self.buffer[:numBytes]
+        return len(data)
+    ############################################################
+
+    ############################################################
+    def tell(self):
+        return self.offset+len(self.buffer)
+    ############################################################
+
+    ############################################################
+    def flush(self):
+        pass
+    ############################################################
+
+    ############################################################
+    def sendChunk(self,chunk):
+        if (self.sessionId is None):
+            self.sessionId = self.dbx.files_upload_session_start(chunk).session_id
+        else:
+            cursor = dropbox.files.UploadSessionCursor(session_id=self.sessionId,offset=self.partOffset)
+            self.dbx.files_upload_session_append_v2(chunk,cursor)
+        self.hasher.update(chunk)
+        self.offset += len(chunk)
+        self.partOffset += len(chunk)
+    ############################################################
+
+    ############################################################
+    def commitChunk(self,chunk,dropboxFile):
+        """ Send the last chunk of the current session, commit it to
+        dropboxFile, check its content_hash, and start a new session
+        for the next part.
+
+        Usage:
+        -----
+        metadata = self.commitChunk(chunk,dropboxFile)
+
+        Returns:
+        -------
+        metadata : dropbox.files.FileMetadata
+            metadata of the committed file.
+
+        Raises:
+        ------
+        ValueError if the content_hash of the committed file is
+        different from the bytes that were sent.
+        """
+
+        if (self.sessionId is None):
+            metadata = self.dbx.files_upload(chunk,dropboxFile,mode=dropbox.files.WriteMode.add)
+        else:
+            cursor = dropbox.files.UploadSessionCursor(session_id=self.sessionId,offset=self.partOffset)
+            commit = dropbox.files.CommitInfo(path=dropboxFile,mode=dropbox.files.WriteMode.add)
+            metadata = self.dbx.files_upload_session_finish(chunk,cursor,commit)
+        self.hasher.update(chunk)
+        self.offset += len(chunk)
+        if (metadata.content_hash!=self.hasher.hexdigest()):
+            raise ValueError('content_hash mismatch for %s' %(dropboxFile))
+        self.sessionId = None
+        self.partOffset = 0
+        self.hasher = contentHash.contentHasher()
+        return metadata
+    ############################################################
+
+    ############################################################
+    def finishPart(self,chunk):
+        splitFile = '%s_split_%04d' %(self.dropboxFile,len(self.partList)+1)
+        metadata = self.commitChunk(chunk,splitFile)
+        self.partList.append((splitFile,metadata.size,metadata.content_hash))
+    ############################################################
+
+    ############################################################
+    def close(self):
+        """ Send the rest of the data and commit the file, or the last
+        part and the sidecar file if the stream was split.
+
+        Usage:
+        -----
+        self.close()
+
+        Returns:
+        -------
+        NULL
+
+        Raises:
+        ------
+        ValueError if the content_hash of a committed file is
+        different from the bytes that were sent.
+        """
+
+        if (self.metadata is not None):
+            return
+        chunk = bytes(self.buffer)
+        self.buffer = bytearray()
+        if (len(self.partList)==0):
+            self.metadata = self.commitChunk(chunk,self.dropboxFile)
+            return
+        self.finishPart(chunk)
+        splitFileList,splitSizeList,hashList = zip(*self.partList)
+        sidecar = utils.splitSidecar(self.dropboxFile,self.offset,splitFileList,splitSizeList,hashList)
+        self.metadata = self.dbx.files_upload(json.dumps(sidecar,indent=1).encode(),self.dropboxFile+'.split.json',mode=dropbox.files.WriteMode.add)
+    ############################################################
+############################################################
+
+
+############################################################
+def zipDir(inputDir,fileObject,compression=zipfile.ZIP_DEFLATED,compresslevel=None):
+    """ Write a zip archive of a directory to an open file object. The
+    names in the archive start with the name of the directory, as with
+    7-Zip.
+
+    Parameters:
+    ----------
+    inputDir : str
+        directory to archive.
+    fileObject : file
+        open binary file, or uploadSessionWriter.
+    compression : int
+        zipfile.ZIP_STORED or zipfile.ZIP_DEFLATED. Default is
+        ZIP_DEFLATED.
+    compresslevel : int
+        deflate level from 1 to 9. Default is None, the zlib default.
+
+    Returns:
+    -------
+    NULL
+
+    Usage:
+    -----
+    with open(zipFileName,'wb') as f:
+        zipDir(inputDir,f,zipfile.ZIP_STORED)
+    """
+
+    inputDir = os.path.normpath(inputDir)
+    parentDir = os.path.dirname(inputDir)
+    kwargs = {} if (compresslevel is None) else {'compresslevel':compresslevel}
+    with zipfile.ZipFile(fileObject,'w',compression=compression,allowZip64=True,**kwargs) as zf:
+        for root,dirs,files in os.walk(inputDir):
+            dirs.sort()
+            if (len(dirs)==0 and len(files)==0):
+                zf.write(root,os.path.relpath(root,parentDir))
+            for fileName in sorted(files):
+                fileName = os.path.join(root,fileName)
+                zf.write(fileName,os.path.relpath(fileName,parentDir))
+############################################################
+
+############################################################
+class zipThread(threading.Thread):
+    """ zipThread class archives one directory with zipDir() on a
+    background thread. It has poll() and returncode like
+    subprocess.Popen so that zipScheduler can run it in place of a
+    7-Zip process.
+
+    The archive is written straight to its destination. If
+    destination starts with 'dropbox:', the rest is a file on Dropbox
+    cloud and the archive is sent with an uploadSessionWriter, in
+    parts of volumeSize bytes if it is larger. Otherwise destination
+    is a local file, for example in the local Dropbox directory. The
+    archive is written to a temporary name that the Dropbox desktop
+    application ignores, and renamed to destination once it is
+    complete, so a partial archive is never synced. If deleteFlag is 1
+    the directory is deleted after the archive is written.
+
+    Usage:
+    -----
+    thread = zipThread(inputDir,destination,deleteFlag,method,accessToken,volumeSize)
+    thread.start()
+    while (thread.poll() is None):
+        time.sleep(1)
+    """
+
+    ############################################################
+    def __init__(self,inputDir,destination,deleteFlag=0,method=None,accessToken=None,volumeSize=None):
+        threading.Thread.__init__(self,daemon=True)
+        self.inputDir = inputDir
+        self.destination = destination
+        self.deleteFlag = deleteFlag
+        self.accessToken = accessToken
+        self.volumeSize = volumeSize
+        self.compression,self.compresslevel = zipfile.ZIP_DEFLATED,None
+        if (method=='-mx0'):
+            self.compression = zipfile.ZIP_STORED
+        elif (method=='-mx1'):
+            self.compresslevel = 1
+        self.returncode = None
+        self.zipSize = 0
+    ############################################################
+
+    ############################################################
+    def run(self):
+        tmpFile = os.path.join(os.path.dirname(self.destination),'~'+os.path.basename(self.destination)+'.tmp')
+        try:
+            if (self.destination.startswith('dropbox:')):
+                writer = uploadSessionWriter(dropbox.Dropbox(self.accessToken),self.destination[len('dropbox:'):],splitSize=self.volumeSize)
+                zipDir(self.inputDir,writer,self.compression,self.compresslevel)
+                writer.close()
+                self.zipSize = writer.offset
+            else:
+                with open(tmpFile,'wb') as f:
+                    zipDir(self.inputDir,f,self.compression,self.compresslevel)
+                os.replace(tmpFile,self.destination)
+                self.zipSize = os.path.getsize(self.destination)
+            if (self.deleteFlag==1):
+                shutil.rmtree(self.inputDir)
+            self.returncode = 0
+        except Exception as e:
+            print ('Error archiving %s - %s' %(self.inputDir,e))
+            if (os.path.isfile(tmpFile)):
+                os.remove(tmpFile)
+            self.returncode = 1
+    ############################################################
+
+    ############################################################
+    def poll(self):
+        return self.returncode
+    ############################################################
+############################################################
@@ -1,12 +1,12 @@
 import os
 import sys
 import pandas
-import subprocess
 import platform
 import datetime
 
 sys.path.append(os.path.abspath('../lib'))
-import utils
+import zipScheduler
+import compressionSampler
 
 ############################################################
 # READ THE INPUT EXCEL FILE AND ZIP ARCHIVE THE FOLDERS
@@ -15,24 +15,43 @@ df = pandas.read_excel('zipDir.xlsx',sheet_name='zipDir',names=['inputDir','dele
 df = df.dropna(axis=0,how='all')
 
 dirDetails = pandas.read_csv('directorySize.txt',delimiter='\t',names=['dirName','numSubDir','numFiles','size'],header=0)
+dirDetails = dirDetails.set_index('dirName')
 logFile = open('../logs/preProcess/zipDir.log','w')
-logFile.write('Timestamp\tDirectory to zip\tNumber of subdirectories\tNumber of files\tDirectory size (GB)\n')
+logFile.write('Timestamp\tDirectory to zip\tNumber of subdirectories\tNumber of files\tDirectory size (GB)\tDuration (s)\tThroughput (MB/s)\tExit code\tCompression\tEntropy (bits/byte)\tEstimated ratio\tAchieved ratio\n')
 
 if (platform.system()=='Linux'):
     executable = '7za'
 elif (platform.system()=='Windows'):
     executable = 'C:/Program Files/7-Zip/7z.exe'
+maxJobs = None      # NUMBER OF FOLDERS ARCHIVED AT THE SAME TIME, None USES HALF THE NUMBER OF CPUs
+jobsPerDisk = 2     # NUMBER OF FOLDERS ARCHIVED AT THE SAME TIME FROM THE SAME DISK
+fileSizeLimit_GB = 500      # FOLDERS LARGER THAN THIS ARE ARCHIVED IN VOLUMES OF THIS SIZE, USE THE SAME VALUE AS IN ../app.py
+sampleCompression = True    # SAMPLE EVERY FOLDER AND STORE DATA THAT DOES NOT COMPRESS (-mx0) OR USE THE FASTEST LEVEL (-mx1)
+streamArchive = False       # True ARCHIVES WITH PYTHON zipfile AND WRITES THE ARCHIVE STRAIGHT TO zipDestination INSTEAD OF NEXT TO THE FOLDER
+zipDestination = None       # WITH streamArchive, THE LOCAL DROPBOX DIRECTORY, OR 'dropbox:/path' TO UPLOAD WITH THE API. None WRITES NEXT TO THE FOLDER
+accessToken = ''            # DROPBOX ACCESS TOKEN, ONLY USED WITH zipDestination 'dropbox:/path'
+
+if (streamArchive):
+    executable = 'zipfile'
+scheduler = zipScheduler.zipScheduler(executable,logFile,maxJobs,jobsPerDisk,accessToken=accessToken)
 for inputDir,deleteFlag in df.values:
-    print ('Archiving the folder %s' %(inputDir))
     zipFileName = inputDir+'.zip'
-    numSubDir = dirDetails[dirDetails['dirName']==inputDir]['numSubDir']
-    numFiles = dirDetails[dirDetails['dirName']==inputDir]['numFiles']
-    size = dirDetails[dirDetails['dirName']==inputDir]['size']
-    logFile.write('%s\t%s\t%d\t%d\t%.6f\n' %(utils.timestamp(),inputDir,numSubDir,numFiles,size))
-    if (deleteFlag==0):
-        subprocess.run([executable,'a',zipFileName,inputDir])
+    if (inputDir in dirDetails.index):
+        numSubDir,numFiles,size = dirDetails.loc[inputDir,['numSubDir','numFiles','size']]
     else:
-        subprocess.run([executable,'a',zipFileName,inputDir,'-sdel'])
+        numSubDir,numFiles,size = 0,0,0
+    job = scheduler.addJob(inputDir,zipFileName,deleteFlag,size,numSubDir,numFiles)
+    if (streamArchive and zipDestination is not None):
+        if (zipDestination.startswith('dropbox:')):
+            job['destination'] = zipDestination.rstrip('/')+'/'+os.path.basename(zipFileName)
+        else:
+            job['destination'] = os.path.join(zipDestination,os.path.basename(zipFileName))
+    if (size>fileSizeLimit_GB and (not(streamArchive) or job['destination'].startswith('dropbox:'))):
+        job['volumeSize'] = fileSizeLimit_GB*1024*1024*1024
+    if (sampleCompression):
+        job['method'],job['estimatedRatio'],job['entropy'] = compressionSampler.chooseMethod(inputDir)
+        print ('%s - estimated ratio %.3f, entropy %.2f bits/byte, compression %s' %(inputDir,job['estimatedRatio'],job['entropy'],job['method'] or 'default'))
+scheduler.run()
         
 logFile.close()
 os.rename('../logs/preProcess/zipDir.log','../logs/preProcess/'+datetime.datetime.now().strftime("%Y%m%d_%H%M%S")+'.log')
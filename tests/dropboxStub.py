@@ -0,0 +1,194 @@
+import hashlib
+import datetime
+import threading
+import requests
+import dropbox
+
+blockSize = 4*1024*1024
+
+############################################################
+def contentHash(data):
+    """ Dropbox content_hash of data, computed independently of
+    lib/contentHash.py so that the upload code is checked against the
+    reference algorithm.
+    See https://www.dropbox.com/developers/reference/content-hash
+
+    Usage:
+    -----
+    hashValue = contentHash(data)
+    """
+
+    blockHashList = [hashlib.sha256(data[i:i+blockSize]).digest() for i in range(0,len(data),blockSize)]
+    return hashlib.sha256(b''.join(blockHashList)).hexdigest()
+############################################################
+
+############################################################
+class dropboxStub:
+    """ dropboxStub class is an in-memory stand-in for dropbox.Dropbox
+    with the upload calls used by dropboxBatch.dropboxAPI. Files are
+    kept in self.fileDict and upload sessions in self.sessionDict. The
+    rules of the Dropbox API that the upload code relies on are
+    checked: chunks appended to a session are a multiple of 4 MB, the
+    cursor offset is the length of the data already received, and a
+    file is only committed over an existing file with
+    WriteMode.overwrite or WriteMode.update with its rev.
+
+    A call can be made to fail with failAfter(), which raises a
+    requests ConnectionError, like a dropped connection, after a given
+    number of successful calls.
+
+    Methods:
+    -------
+    failAfter(methodName,numCalls)
+    files_upload(f,path,mode)
+    files_upload_session_start(f,close)
+    files_upload_session_append_v2(f,cursor,close)
+    files_upload_session_finish(f,cursor,commit)
+    files_upload_session_finish_batch_v2(entries)
+    files_create_folder(path,autorename)
+
+    Usage:
+    -----
+    import dropboxStub
+    dbx = dropboxStub.dropboxStub()
+    dbx.failAfter('files_upload_session_append_v2',1)
+    """
+
+    ############################################################
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.fileDict = {}
+        self.sessionDict = {}
+        self.callCount = {}
+        self.faultDict = {}
+        self.numRevs = 0
+    ############################################################
+
+    ############################################################
+    def failAfter(self,methodName,numCalls):
+        """ Make the call after the next numCalls calls of methodName
+        raise requests.exceptions.ConnectionError.
+
+        Usage:
+        -----
+        self.failAfter(methodName,numCalls)
+        """
+
+        self.faultDict[methodName] = numCalls
+    ############################################################
+
+    ############################################################
+    def count(self,methodName):
+        with self.lock:
+            self.callCount[methodName] = self.callCount.get(methodName,0)+1
+            numCalls = self.faultDict.get(methodName)
+            if (numCalls is not None):
+                if (numCalls==0):
+                    del self.faultDict[methodName]
+                    raise requests.exceptions.ConnectionError('%s failed by dropboxStub' %(methodName))
+                self.faultDict[methodName] = numCalls-1
+    ############################################################
+
+    ############################################################
+    def apiError(self,error):
+        return dropbox.exceptions.ApiError('stub',error,None,None)
+    ############################################################
+
+    ############################################################
+    def lookupSession(self,cursor):
+        session = self.sessionDict.get(cursor.session_id)
+        if (session is None):
+            raise self.apiError(dropbox.files.UploadSessionLookupError.not_found)
+        if (cursor.offset!=len(session['data'])):
+            raise self.apiError(dropbox.files.UploadSessionLookupError.incorrect_offset(dropbox.files.UploadSessionOffsetError(correct_offset=len(session['data']))))
+        return session
+    ############################################################
+
+    ############################################################
+    def commit(self,data,path,mode):
+        """ Store data in path following mode. Returns the metadata of
+        the file, or the WriteError if it can not be written.
+        """
+
+        with self.lock:
+            existing = self.fileDict.get(path.lower())
+            if (existing is not None and not(mode.is_overwrite()) and not(mode.is_update() and mode.get_update()==existing[1].rev)):
+                return None,dropbox.files.WriteError.conflict(dropbox.files.WriteConflictError.file)
+            self.numRevs += 1
+            now = datetime.datetime(2020,1,1)
+            metadata = dropbox.files.FileMetadata(name=path.rsplit('/',1)[-1],id='id:%d' %(self.numRevs),client_modified=now,server_modified=now,\
+                rev='%015x' %(self.numRevs),size=len(data),path_lower=path.lower(),path_display=path,content_hash=contentHash(data))
+            self.fileDict[path.lower()] = (bytes(data),metadata)
+            return metadata,None
+    ############################################################
+
+    ############################################################
+    def files_upload(self,f,path,mode=dropbox.files.WriteMode.add):
+        self.count('files_upload')
+        metadata,error = self.commit(f,path,mode)
+        if (error is not None):
+            raise self.apiError(dropbox.files.UploadError.path(dropbox.files.UploadWriteFailed(reason=error,upload_session_id='stub')))
+        return metadata
+    ############################################################
+
+    ############################################################
+    def files_upload_session_start(self,f,close=False):
+        self.count('files_upload_session_start')
+        if not(close) and (len(f)%blockSize!=0):
+            raise ValueError('Chunks appended to an upload session must be a multiple of 4 MB')
+        with self.lock:
+            sessionId = 'session%d' %(len(self.sessionDict)+1)
+            self.sessionDict[sessionId] = {'data':bytearray(f),'closed':close}
+        return dropbox.files.UploadSessionStartResult(session_id=sessionId)
+    ############################################################
+
+    ############################################################
+    def files_upload_session_append_v2(self,f,cursor,close=False):
+        self.count('files_upload_session_append_v2')
+        session = self.lookupSession(cursor)
+        if (session['closed']):
+            raise self.apiError(dropbox.files.UploadSessionLookupError.closed)
+        if not(close) and (len(f)%blockSize!=0):
+            raise ValueError('Chunks appended to an upload session must be a multiple of 4 MB')
+        session['data'] += f
+        session['closed'] = close
+    ############################################################
+
+    ############################################################
+    def files_upload_session_finish(self,f,cursor,commit):
+        self.count('files_upload_session_finish')
+        session = self.lookupSession(cursor)
+        metadata,error = self.commit(bytes(session['data'])+bytes(f),commit.path,commit.mode)
+        if (error is not None):
+            raise self.apiError(dropbox.files.UploadSessionFinishError.path(error))
+        del self.sessionDict[cursor.session_id]
+        return metadata
+    ############################################################
+
+    ############################################################
+    def files_upload_session_finish_batch_v2(self,entries):
+        self.count('files_upload_session_finish_batch_v2')
+        resultList = []
+        for entry in entries:
+            try:
+                session = self.lookupSession(entry.cursor)
+            except dropbox.exceptions.ApiError as e:
+                resultList.append(dropbox.files.UploadSessionFinishBatchResultEntry.failure(dropbox.files.UploadSessionFinishError.lookup_failed(e.error)))
+                continue
+            if not(session['closed']):
+                resultList.append(dropbox.files.UploadSessionFinishBatchResultEntry.failure(dropbox.files.UploadSessionFinishError.concurrent_session_not_closed))
+                continue
+            metadata,error = self.commit(session['data'],entry.commit.path,entry.commit.mode)
+            if (error is not None):
+                resultList.append(dropbox.files.UploadSessionFinishBatchResultEntry.failure(dropbox.files.UploadSessionFinishError.path(error)))
+            else:
+                del self.sessionDict[entry.cursor.session_id]
+                resultList.append(dropbox.files.UploadSessionFinishBatchResultEntry.success(metadata))
+        return dropbox.files.UploadSessionFinishBatchResult(entries=resultList)
+    ############################################################
+
+    ############################################################
+    def files_create_folder(self,path,autorename=False):
+        self.count('files_create_folder')
+    ############################################################
+############################################################
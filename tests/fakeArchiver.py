@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+""" Stand-in for the 7-Zip executable used by zipScheduler. It accepts
+the command line built by zipScheduler.command():
+
+    fakeArchiver.py a zipFileName inputDir -mmtN [-mxN] [-vNb] [-sdel]
+
+and writes a zip archive of inputDir with Python's zipfile, in volumes
+zipFileName.001, zipFileName.002, ... of N bytes if -vNb is given, the
+same way as 7-Zip. If the name of inputDir is in the comma separated
+environment variable FAKE_ARCHIVER_FAIL, the volumes are written and
+the exit code is 2, like a 7-Zip run that failed part way.
+
+Usage:
+-----
+scheduler = zipScheduler.zipScheduler('tests/fakeArchiver.py',logFile)
+"""
+
+import os
+import io
+import sys
+import shutil
+import zipfile
+
+############################################################
+def main(argList):
+    command,zipFileName,inputDir = argList[:3]
+    if (command!='a'):
+        return 7
+    volumeSize = None
+    for arg in argList[3:]:
+        if (arg.startswith('-v') and arg.endswith('b')):
+            volumeSize = int(arg[2:-1])
+
+    buffer = io.BytesIO()
+    inputDir = os.path.normpath(inputDir)
+    with zipfile.ZipFile(buffer,'w',zipfile.ZIP_DEFLATED) as zf:
+        for root,dirs,files in os.walk(inputDir):
+            dirs.sort()
+            for fileName in sorted(files):
+                fileName = os.path.join(root,fileName)
+                zf.write(fileName,os.path.relpath(fileName,os.path.dirname(inputDir)))
+    data = buffer.getvalue()
+
+    if (volumeSize is None):
+        with open(zipFileName,'wb') as f:
+            f.write(data)
+    else:
+        for i in range(0,len(data),volumeSize):
+            with open('%s.%03d' %(zipFileName,i//volumeSize+1),'wb') as f:
+                f.write(data[i:i+volumeSize])
+
+    if (os.path.basename(inputDir) in os.environ.get('FAKE_ARCHIVER_FAIL','').split(',')):
+        return 2
+    if ('-sdel' in argList):
+        shutil.rmtree(inputDir)
+    return 0
+############################################################
+
+if (__name__=='__main__'):
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,150 @@
+import os
+import io
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import threading
+import collections
+from unittest import mock
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','lib'))
+import requests
+import dropboxBatch
+import uploadJournal
+import dropboxStub
+
+mb = 1024*1024
+
+############################################################
+def makeAPI(dbx,journalFile=None,chunkSize=4*mb,numWorkers=4):
+    """ Create a dropboxAPI without reading the excel sheet or
+    uploading anything, with dbx as its Dropbox client.
+
+    Usage:
+    -----
+    api = makeAPI(dbx,journalFile)
+    """
+
+    api = dropboxBatch.dropboxAPI.__new__(dropboxBatch.dropboxAPI)
+    api.dbx = dbx
+    api.accessToken = ''
+    api.chunkSize = chunkSize
+    api.numWorkers = numWorkers
+    api.batchLimit = 1000
+    api.threadLocal = threading.local()
+    api.journal = uploadJournal.uploadJournal(journalFile)
+    api.partsRemaining = collections.Counter()
+    api.logFile = io.StringIO()
+    return api
+############################################################
+
+############################################################
+class testDropboxAPI(unittest.TestCase):
+    """ Upload files with dropboxBatch.dropboxAPI to
+    dropboxStub.dropboxStub.
+    """
+
+    ############################################################
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.dbx = dropboxStub.dropboxStub()
+    ############################################################
+
+    ############################################################
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+    ############################################################
+
+    ############################################################
+    def writeFile(self,name,data):
+        fileName = os.path.join(self.tempDir,name)
+        with open(fileName,'wb') as f:
+            f.write(data)
+        return fileName
+    ############################################################
+
+    ############################################################
+    def remoteData(self,dropboxFile):
+        return self.dbx.fileDict[dropboxFile.lower()][0]
+    ############################################################
+
+    ############################################################
+    def testUploadBatch(self):
+        dataList = [os.urandom(1000*(i+1)) for i in range(5)]
+        fileNameList = [self.writeFile('small%d' %(i),data) for i,data in enumerate(dataList)]
+        dropboxFileList = ['/Data/small%d' %(i) for i in range(5)]
+        self.dbx.commit(b'unrelated',dropboxFileList[4],dropboxBatch.dropbox.files.WriteMode.add)
+        api = makeAPI(self.dbx)
+        with mock.patch.object(dropboxBatch.dropbox,'Dropbox',return_value=self.dbx):
+            api.uploadBatch(fileNameList,[len(data) for data in dataList],dropboxFileList)
+        for fileName,dropboxFile,data in zip(fileNameList[:4],dropboxFileList[:4],dataList[:4]):
+            self.assertEqual(self.remoteData(dropboxFile),data)
+            self.assertFalse(os.path.exists(fileName))
+        self.assertEqual(self.remoteData(dropboxFileList[4]),b'unrelated')
+        self.assertTrue(os.path.exists(fileNameList[4]))
+        self.assertEqual(self.dbx.callCount['files_upload_session_finish_batch_v2'],3)
+    ############################################################
+
+    ############################################################
+    def testUploadSessionRetry(self):
+        data = os.urandom(3*4*mb+123)
+        fileName = self.writeFile('large',data)
+        self.dbx.failAfter('files_upload_session_append_v2',1)
+        api = makeAPI(self.dbx)
+        api.uploadFile(fileName,len(data),'/Data/large')
+        self.assertEqual(self.remoteData('/Data/large'),data)
+        self.assertFalse(os.path.exists(fileName))
+        self.assertEqual(self.dbx.callCount['files_upload_session_start'],1)
+        self.assertEqual(self.dbx.callCount['files_upload_session_append_v2'],2+1)
+    ############################################################
+
+    ############################################################
+    def testUploadSessionResumeNewRun(self):
+        data = os.urandom(3*4*mb+123)
+        fileName = self.writeFile('large',data)
+        journalFile = os.path.join(self.tempDir,'uploadJournal.json')
+        self.dbx.failAfter('files_upload_session_append_v2',0)
+        api = makeAPI(self.dbx,journalFile)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            api.uploadSession(fileName,len(data),'/Data/large')
+        with open(journalFile,'r') as f:
+            self.assertEqual(json.load(f)['/Data/large']['offset'],4*mb)
+
+        api = makeAPI(self.dbx,journalFile)
+        api.uploadFile(fileName,len(data),'/Data/large')
+        self.assertEqual(self.remoteData('/Data/large'),data)
+        self.assertFalse(os.path.exists(fileName))
+        self.assertEqual(self.dbx.callCount['files_upload_session_start'],1)
+        with open(journalFile,'r') as f:
+            self.assertEqual(json.load(f),{})
+    ############################################################
+
+    ############################################################
+    def testVirtualSplit(self):
+        data = os.urandom(2*4*mb+4*mb//2)
+        fileName = self.writeFile('split',data)
+        api = makeAPI(self.dbx)
+        api.partsRemaining[fileName] = 2
+        api.uploadFile(fileName,2*4*mb,'/Data/split_split_0001',0)
+        self.assertTrue(os.path.exists(fileName))
+        api.uploadFile(fileName,len(data)-2*4*mb,'/Data/split_split_0002',2*4*mb)
+        self.assertEqual(self.remoteData('/Data/split_split_0001'),data[:2*4*mb])
+        self.assertEqual(self.remoteData('/Data/split_split_0002'),data[2*4*mb:])
+        self.assertFalse(os.path.exists(fileName))
+    ############################################################
+
+    ############################################################
+    def testGrownFile(self):
+        data = os.urandom(102)
+        fileName = self.writeFile('grown',data)
+        api = makeAPI(self.dbx)
+        api.uploadFile(fileName,2,'/Data/grown')
+        self.assertEqual(self.remoteData('/Data/grown'),data)
+        self.assertFalse(os.path.exists(fileName))
+    ############################################################
+############################################################
+
+if (__name__=='__main__'):
+    unittest.main()
@@ -0,0 +1,131 @@
+import os
+import io
+import sys
+import json
+import shutil
+import zipfile
+import tempfile
+import unittest
+from unittest import mock
+
+testDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,os.path.join(testDir,'..','lib'))
+import utils
+import zipStream
+import zipScheduler
+import dropboxStub
+
+fakeArchiver = os.path.join(testDir,'fakeArchiver.py')
+
+############################################################
+class testZipScheduler(unittest.TestCase):
+    """ Run zipScheduler with tests/fakeArchiver.py in place of 7-Zip,
+    and with zipfile streaming to dropboxStub.dropboxStub.
+    """
+
+    ############################################################
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        os.chmod(fakeArchiver,0o755)
+        self.dataDict = {}
+    ############################################################
+
+    ############################################################
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+    ############################################################
+
+    ############################################################
+    def makeDir(self,name,numFiles,fileSize):
+        inputDir = os.path.join(self.tempDir,name)
+        os.makedirs(os.path.join(inputDir,'sub'))
+        for i in range(numFiles):
+            fileName = os.path.join(inputDir,'sub','file%d' %(i))
+            self.dataDict['%s/sub/file%d' %(name,i)] = os.urandom(fileSize)
+            with open(fileName,'wb') as f:
+                f.write(self.dataDict['%s/sub/file%d' %(name,i)])
+        return inputDir
+    ############################################################
+
+    ############################################################
+    def checkArchive(self,data,name):
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            for arcName in zf.namelist():
+                self.assertEqual(zf.read(arcName),self.dataDict[arcName])
+            self.assertEqual(sorted(zf.namelist()),sorted(key for key in self.dataDict if key.startswith(name+'/')))
+    ############################################################
+
+    ############################################################
+    @unittest.skipIf(os.name=='nt','fakeArchiver.py is run through its shebang line')
+    def testRunJobs(self):
+        smallDir = self.makeDir('small',3,1000)
+        largeDir = self.makeDir('large',3,100*1024)
+        brokenDir = self.makeDir('broken',3,100*1024)
+        logFile = io.StringIO()
+        scheduler = zipScheduler.zipScheduler(fakeArchiver,logFile,maxJobs=2,jobsPerDisk=2,numThreads=4)
+        scheduler.addJob(smallDir,smallDir+'.zip',1,0.001,1,3)
+        job = scheduler.addJob(largeDir,largeDir+'.zip',0,0.001,1,3)
+        job['volumeSize'] = 128*1024
+        job = scheduler.addJob(brokenDir,brokenDir+'.zip',0,0.001,1,3)
+        job['volumeSize'] = 128*1024
+        self.assertEqual(scheduler.command(job,2)[-2:],['-mmt2','-v131072b'])
+        with mock.patch.dict(os.environ,{'FAKE_ARCHIVER_FAIL':'broken'}):
+            scheduler.run()
+
+        with open(smallDir+'.zip','rb') as f:
+            self.checkArchive(f.read(),'small')
+        self.assertFalse(os.path.exists(smallDir))
+
+        fileSize,splitFileList,splitSizeList,hashList = utils.readSplitSidecar(largeDir+'.zip.split.json')
+        self.assertEqual([os.path.basename(splitFile) for splitFile in splitFileList],['large.zip_split_%04d' %(i+1) for i in range(3)])
+        self.assertFalse(os.path.exists(largeDir+'.zip.001'))
+        dataList = []
+        for splitFile,splitSize in zip(splitFileList,splitSizeList):
+            with open(splitFile,'rb') as f:
+                dataList.append(f.read())
+            self.assertEqual(len(dataList[-1]),splitSize)
+        data = b''.join(dataList)
+        self.assertEqual(len(data),fileSize)
+        self.checkArchive(data,'large')
+
+        self.assertTrue(os.path.exists(brokenDir+'.zip.001'))
+        self.assertFalse(os.path.exists(brokenDir+'.zip_split_0001'))
+        self.assertFalse(os.path.exists(brokenDir+'.zip.split.json'))
+
+        exitCodeDict = {}
+        for line in logFile.getvalue().splitlines():
+            columnList = line.split('\t')
+            self.assertEqual(len(columnList),12)
+            exitCodeDict[os.path.basename(columnList[1])] = int(columnList[7])
+        self.assertEqual(exitCodeDict,{'small':0,'large':0,'broken':2})
+    ############################################################
+
+    ############################################################
+    def testStreamSplit(self):
+        inputDir = self.makeDir('stream',3,5*1024*1024)
+        dbx = dropboxStub.dropboxStub()
+        logFile = io.StringIO()
+        scheduler = zipScheduler.zipScheduler('zipfile',logFile,maxJobs=1)
+        job = scheduler.addJob(inputDir,inputDir+'.zip',0,0.015,1,3)
+        job['destination'] = 'dropbox:/Archive/stream.zip'
+        job['method'] = '-mx0'
+        job['volumeSize'] = 6*1024*1024
+        with mock.patch.object(zipStream.dropbox,'Dropbox',return_value=dbx):
+            scheduler.run()
+
+        sidecar = json.loads(dbx.fileDict['/archive/stream.zip.split.json'][0])
+        self.assertEqual(sidecar['numSplits'],3)
+        dataList = []
+        for split in sidecar['splitList']:
+            data,metadata = dbx.fileDict['/archive/'+split['name']]
+            self.assertEqual((len(data),dropboxStub.contentHash(data)),(split['size'],split['contentHash']))
+            dataList.append(data)
+        self.assertEqual(len(dataList[0]),6*1024*1024)
+        self.checkArchive(b''.join(dataList),'stream')
+        self.assertNotIn('/archive/stream.zip',dbx.fileDict)
+        self.assertEqual(logFile.getvalue().split('\t')[7],'0')
+    ############################################################
+############################################################
+
+if (__name__=='__main__'):
+    unittest.main()